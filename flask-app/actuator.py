@@ -0,0 +1,198 @@
+import os
+import queue
+import threading
+import time
+
+import serial
+
+# Commands understood by the controller thread
+FIRE = 'fire'
+CANCEL = 'cancel'
+STOP = 'stop'
+
+# Controller states
+IDLE = 'idle'
+FIRING = 'firing'
+DISCONNECTED = 'disconnected'
+
+# Bytes the Arduino sketch (arduino/servo.ino) listens for
+SWING = b'1'
+REST = b'0'
+
+
+class ActuatorController(threading.Thread):
+    """Owns the thwarter's serial port on its own thread.
+
+    fire() and cancel() only enqueue a command, so the recognition loop never
+    waits on the servo. A fire lasts fire_duration seconds, after which the
+    controller sends the rest byte itself. Each target can fire at most once
+    per cooldown."""
+
+    def __init__(self, port, baudrate=9600, fire_duration=6, cooldown=30,
+                 settle_time=2, clock=time.monotonic):
+        super().__init__(name='actuator', daemon=True)
+        self.port = port
+        self.baudrate = baudrate
+        self.fire_duration = fire_duration
+        self.cooldown = cooldown
+        self.settle_time = settle_time
+        self.clock = clock
+        self.commands = queue.Queue()
+        self.state = DISCONNECTED
+        self.current_target = None
+        self.fire_count = 0
+        self.last_fired = {}
+        self._ser = None
+        self._fire_until = None
+        self._lock = threading.Lock()
+
+    def fire(self, target='default'):
+        # Returns False if the target is still cooling down
+        if not self.ready(target):
+            return False
+        self.commands.put((FIRE, target))
+        return True
+
+    def cancel(self):
+        self.commands.put((CANCEL, None))
+
+    def stop(self):
+        self.commands.put((STOP, None))
+
+    def connected(self):
+        return self.is_alive() and self.state != DISCONNECTED
+
+    def ready(self, target='default'):
+        # Whether fire(target) would be accepted right now; never while the
+        # port isn't open, since nothing would reach the servo
+        if not self.connected():
+            return False
+        with self._lock:
+            last = self.last_fired.get(target)
+        return last is None or self.clock() - last >= self.cooldown
+
+    def is_firing(self):
+        return self.state == FIRING
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'target': self.current_target,
+                'fire_count': self.fire_count,
+                'cooling_down': sorted(target for target, last in self.last_fired.items()
+                                       if self.clock() - last < self.cooldown),
+            }
+
+    def run(self):
+        try:
+            self._ser = serial.Serial(self.port, self.baudrate, timeout=1)
+        except serial.SerialException as e:
+            print(f"Error opening actuator port {self.port}: {e}")
+            return
+        # Allow some time for the connection to establish
+        time.sleep(self.settle_time)
+        print('connected:', self._ser)
+        self.state = IDLE
+
+        try:
+            while True:
+                timeout = None
+                if self._fire_until is not None:
+                    timeout = max(0, self._fire_until - self.clock())
+                try:
+                    command, target = self.commands.get(timeout=timeout)
+                except queue.Empty:
+                    self._rest()  # Swing finished
+                    continue
+
+                if command == STOP:
+                    break
+                if command == CANCEL:
+                    self._rest()
+                elif command == FIRE:
+                    self._fire(target)
+        finally:
+            self._rest()
+            self._ser.close()
+            self.state = DISCONNECTED
+
+    def _fire(self, target):
+        now = self.clock()
+        with self._lock:
+            last = self.last_fired.get(target)
+            if last is not None and now - last < self.cooldown:
+                return
+            self.last_fired[target] = now
+            # Drop expired cooldowns so the dict stays small
+            self.last_fired = {t: last for t, last in self.last_fired.items()
+                               if now - last < self.cooldown}
+            self.fire_count += 1
+        if self.state != FIRING:
+            self._ser.write(SWING)
+        self.state = FIRING
+        self.current_target = target
+        self._fire_until = now + self.fire_duration
+
+    def _rest(self):
+        if self.state == FIRING:
+            self._ser.write(REST)
+        self.state = IDLE
+        self.current_target = None
+        self._fire_until = None
+
+
+class FakeSerialDevice:
+    """Pseudo-terminal that stands in for the Arduino. Open `port` like a
+    real serial port; every byte written to it is recorded in `received`."""
+
+    def __init__(self):
+        # POSIX only, so imported here: the door box itself runs Windows
+        import pty
+        import tty
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.received = bytearray()
+        self._closed = threading.Event()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while not self._closed.is_set():
+            try:
+                data = os.read(self._master, 64)
+            except OSError:
+                break
+            if not data:
+                break
+            self.received.extend(data)
+
+    def close(self):
+        self._closed.set()
+        os.close(self._slave)
+        os.close(self._master)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    # Dry run of the controller against a fake device, no Arduino needed
+    with FakeSerialDevice() as device:
+        controller = ActuatorController(
+            device.port, fire_duration=1, cooldown=5, settle_time=0)
+        controller.start()
+        time.sleep(0.1)
+        print('fire caleb:', controller.fire('caleb'))
+        time.sleep(0.1)
+        print('status:', controller.status())
+        print('fire caleb again:', controller.fire('caleb'))
+        time.sleep(1.2)
+        controller.stop()
+        controller.join()
+        print('device received:', bytes(device.received))
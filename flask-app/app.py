@@ -1,15 +1,20 @@
 import json
-from webbrowser import get
-from flask import Flask, request, jsonify, g, render_template
+from flask import Flask, Response, request, jsonify, g, render_template
 from flask_cors import CORS
 from utils import generate_unique_id
-import sqlite3
+import storage
 import os
 from werkzeug.utils import secure_filename
 import threading
-from face_detection import live_verification, extract_frames_from_mp4
+import glob
+from gallery import label_from_path
+from shards import GalleryShards
+from ingest import prepare_video
+from jobs import JobQueue, QueueFull
+import metrics
+from models import warm_up, warm_up_report
+from preview import PreviewServer, BOUNDARY as PREVIEW_BOUNDARY
 import datetime
-from moviepy.editor import VideoFileClip
 
 
 DATABASE = 'sample.db'
@@ -19,82 +24,142 @@ app.config['UPLOAD_FOLDER'] = 'uploads/'  # Make sure this folder exists
 app.config['ALLOWED_EXTENSIONS'] = {'mp4', 'quicktime'}
 CORS(app)
 
-# function to start the face id verification
-
-
-def convert_mov_to_mp4(file_path):
-    # Check if the file has a .mov extension
-    if not file_path.lower().endswith('.mov'):
-        raise ValueError("The input file must have a .mov extension")
-
-    # Load the .mov video file
-    clip = VideoFileClip(file_path)
-
-    # Create the output file path with .mp4 extension
-    output_file_path = os.path.splitext(file_path)[0] + '.mp4'
+# Background workers for guest registration processing
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 32))
+jobs = JobQueue(workers=app.config['JOB_WORKERS'],
+                max_pending=app.config['JOB_QUEUE_SIZE'])
 
-    # Write the output as an .mp4 file
-    clip.write_videofile(output_file_path, codec="libx264")
+# Low-rate annotated preview of the door camera, only rendered while a
+# client is connected to /preview
+preview = PreviewServer(max_fps=5, max_width=640)
 
-    return output_file_path
+# Guest embeddings are kept per event; only the running event's shard is in
+# memory, and loaded shards are capped at SHARD_BUDGET_MB
+app.config['SHARD_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'shards')
+app.config['SHARD_BUDGET_MB'] = int(os.environ.get('SHARD_BUDGET_MB', 256))
+shards = GalleryShards(app.config['SHARD_FOLDER'],
+                       max_bytes=app.config['SHARD_BUDGET_MB'] * 2**20)
 
+# The door camera serves one event at a time
+running_event = {'id': None, 'stop': None, 'timer': None}
+running_lock = threading.Lock()
 
-def run_face_id():
-    live_verification(db_path='.\\uploads', threshold=0.3)
-
+# function to start the face id verification
 
-def run_extraction():
-    extract_frames_from_mp4()
 
-# Function to get a connection to the SQLite database
+def run_face_id(event_id, stop, expires_at=None, images=()):
+    # Server-side: no window, just the optional MJPEG preview at /preview.
+    # Only this event's guests can be recognized. The recognition stack
+    # (TensorFlow, camera, serial port) is only loaded once an event starts.
+    from face_detection import live_verification
+
+    gallery = shards.load(event_id, expires_at=expires_at, images=images)
+    if stop.is_set():
+        return
+    live_verification(gallery=gallery, threshold=0.3, event_id=event_id,
+                      headless=True, preview=preview, stop=stop)
+
+
+# Times as the mobile app sends them (toLocaleTimeString(), e.g. "6:30:00 PM"
+# or "18:30:00" depending on the phone's locale)
+TIME_FORMATS = ('%I:%M:%S %p', '%I:%M %p', '%H:%M:%S', '%H:%M')
+
+
+def event_time(date, time):
+    # Local datetime from an event's date column and a startTime/endTime
+    # value, or None if they can't be parsed
+    try:
+        return datetime.datetime.fromisoformat(time)
+    except (TypeError, ValueError):
+        pass
+    try:
+        day = datetime.date.fromisoformat(date)
+        # Newer ICU puts a narrow no-break space before AM/PM
+        time = ' '.join(time.replace('\u202f', ' ').split())
+    except (TypeError, ValueError, AttributeError):
+        return None
+    for time_format in TIME_FORMATS:
+        try:
+            at = datetime.datetime.strptime(time.upper(), time_format).time()
+        except ValueError:
+            continue
+        return datetime.datetime.combine(day, at)
+    return None
+
+
+def event_start(date, start_time):
+    # The scheduled start, or once the event has been started, when it was:
+    # /start-event stores SQLite's CURRENT_TIMESTAMP, which is UTC
+    try:
+        started = datetime.datetime.fromisoformat(start_time)
+    except (TypeError, ValueError):
+        return event_time(date, start_time)
+    return started.replace(tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def event_end(date, start_time, end_time):
+    # When the event ends, or None if endTime can't be parsed. An end before
+    # the start means the event runs past midnight.
+    end = event_time(date, end_time)
+    start = event_start(date, start_time)
+    if end is not None and start is not None and end <= start:
+        end += datetime.timedelta(days=1)
+    return end
+
+
+def event_images(event_id):
+    # Enrollment frames of the event's guests, for building a missing shard
+    db = get_db()
+    videos = db.execute(
+        "SELECT videoName FROM guests WHERE eventId = ?", (event_id,)).fetchall()
+    images = []
+    for (video_name,) in videos:
+        name, _ = os.path.splitext(video_name)
+        images.extend(sorted(glob.glob(os.path.join(
+            app.config['UPLOAD_FOLDER'], glob.escape(name) + '_frame*.jpg'))))
+    return images
+
+
+def stop_running_event(event_id=None):
+    # Stop recognition and unload the event's shard. With an event_id, only
+    # stops if that event is the one running. Returns the stopped event id.
+    with running_lock:
+        stopped = running_event['id']
+        if stopped is None or (event_id is not None and event_id != stopped):
+            return None
+        running_event['stop'].set()
+        if running_event['timer'] is not None:
+            running_event['timer'].cancel()
+        running_event.update(id=None, stop=None, timer=None)
+    shards.evict(stopped)
+    shards.expire()
+    print(f"Stopped event {stopped}")
+    return stopped
+
+
+# Function to get a connection to the SQLite database. Connections come from
+# storage's pool, so this doesn't reopen the file on every request.
 
 
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
+        db = g._database = storage.get_connection(DATABASE)
     return db
 
-# Initialize the database (Run this once to create the table)
+# Initialize the database (creates tables and indexes, safe to re-run)
 
 
 def init_db():
-    with app.app_context():
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS events (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            hostEmail TEXT NOT NULL,
-                            eventId TEXT NOT NULL,
-                            name TEXT NOT NULL,
-                            date DATE NOT NULL,
-                            location TEXT NOT NULL,
-                            startTime TIME NOT NULL,
-                            endTime TIME NOT NULL
-                          )''')
-        cursor.execute('''CREATE TABLE IF NOT EXISTS guests (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            eventId TEXT NOT NULL,
-                            name TEXT NOT NULL,
-                            email TEXT NOT NULL,
-                            videoName TEXT NOT NULL
-                          )''')
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS entry_log (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            eventId TEXT NOT NULL,
-                            guestId TEXT NOT NULL,
-                            entryTime TIMESTAMP,
-                            exitTime TIMESTAMP 
-                          )''')
-        db.commit()
+    storage.init_db(DATABASE)
 
 
 @app.teardown_appcontext
 def close_connection(exception):
     db = getattr(g, '_database', None)
     if db is not None:
-        db.close()
+        storage.release_connection(DATABASE, db)
 
 
 @app.route('/')
@@ -113,41 +178,138 @@ def start_event():
     event_id = data.get('event_id')
     if not event_id:
         return jsonify({'error': 'Event ID is required'}), 400
+    event_id = str(event_id)
 
     db = get_db()
     cursor = db.cursor()
+    event = cursor.execute(
+        "SELECT date, startTime, endTime FROM events WHERE eventId = ?", (event_id,)).fetchone()
+    end = event_end(*event) if event else None
+    if end is not None and end <= datetime.datetime.now():
+        # Starting would stop again straight away
+        return jsonify({'error': 'Event has already ended'}), 409
     cursor.execute(
         "UPDATE events SET startTime = CURRENT_TIMESTAMP WHERE eventId = ?", (event_id,))
     db.commit()
 
-    face_id_thread = threading.Thread(target=run_face_id)
+    stop_running_event()
+    stop = threading.Event()
+    # Recognition stops and the shard is unloaded once the event is over.
+    # Without a parseable endTime it runs until /stop-event.
+    timer = None
+    if end is not None:
+        delay = (end - datetime.datetime.now()).total_seconds()
+        timer = threading.Timer(max(0, delay), stop_running_event, args=(event_id,))
+        timer.daemon = True
+    with running_lock:
+        running_event.update(id=event_id, stop=stop, timer=timer)
+        # Only once the event is registered, or an already-due timer would
+        # find nothing to stop
+        if timer is not None:
+            timer.start()
+
+    face_id_thread = threading.Thread(target=run_face_id, args=(
+        event_id, stop, end.timestamp() if end else None, event_images(event_id)))
     face_id_thread.start()
 
     return jsonify({"message": "Event started successfully!"}), 200
 
 
+@app.route('/stop-event', methods=['POST'])
+def stop_event():
+    data = request.json
+    event_id = data.get('event_id')
+    if not event_id:
+        return jsonify({'error': 'Event ID is required'}), 400
+    if stop_running_event(str(event_id)) is None:
+        return jsonify({'error': 'Event is not running'}), 404
+    return jsonify({"message": "Event stopped successfully!"}), 200
+
+
+INSERT_ENTRY = '''
+    INSERT INTO entry_log (eventId, guestId, entryTime, exitTime)
+    VALUES (?, ?, ?, ?)
+'''
+
+
+@app.route('/preview')
+def preview_stream():
+    return Response(preview.stream(),
+                    mimetype=f'multipart/x-mixed-replace; boundary={PREVIEW_BOUNDARY}')
+
+
+@app.route('/metrics')
+def get_metrics():
+    # Prometheus scrape target; recognition runs in this process, so its
+    # metrics are here too
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/log-attendee', methods=['POST'])
 def log_attendee():
     data = request.json  # Assuming the data is sent as JSON
     event_id = data.get('event_id')
     guest_id = data.get('name')  # Assuming 'name' is the guest ID
-    entry_time = datetime.now()  # Record the current time for the entry
+    entry_time = datetime.datetime.now()  # Record the current time for the entry
 
     db = get_db()
     cursor = db.cursor()
 
     # Insert the attendee's entry into the entry_log table
-    cursor.execute('''
-        INSERT INTO entry_log (eventId, guestId, entryTime, exitTime)
-        VALUES (?, ?, ?, ?)
-    ''', (event_id, guest_id, entry_time, None))
+    cursor.execute(INSERT_ENTRY, (event_id, guest_id, entry_time, None))
 
-    cursor.commit()
+    db.commit()
     cursor.close()
 
     return "Attendee logged successfully", 200
 
 
+def parse_sighting(item):
+    # Turn one sighting into an entry_log row, or raise ValueError
+    if not isinstance(item, dict):
+        raise ValueError('Sighting must be an object')
+    event_id = item.get('event_id')
+    guest_id = item.get('name')  # Assuming 'name' is the guest ID
+    if event_id is None or not guest_id:
+        raise ValueError('event_id and name are required')
+    entry_time = item.get('time')
+    if entry_time:
+        # Keep the time the guest was seen, not when the batch arrived
+        entry_time = datetime.datetime.strptime(entry_time, "%Y-%m-%d %H:%M:%S")
+    else:
+        entry_time = datetime.datetime.now()
+    return (str(event_id), guest_id, entry_time, None)
+
+
+@app.route('/log-attendee/batch', methods=['POST'])
+def log_attendee_batch():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('events')
+    if not isinstance(data, list):
+        return jsonify({'error': 'Expected a list of sightings'}), 400
+
+    rows = []
+    results = []
+    for index, item in enumerate(data):
+        try:
+            rows.append(parse_sighting(item))
+            results.append({'index': index, 'status': 'logged'})
+        except (TypeError, ValueError) as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+
+    # All valid rows go in with one transaction and one commit
+    db = get_db()
+    with db:
+        db.executemany(INSERT_ENTRY, rows)
+
+    return jsonify({
+        'logged': len(rows),
+        'failed': len(data) - len(rows),
+        'results': results
+    }), 200
+
+
 @app.route('/entries')
 def show_entries():
     db = get_db()
@@ -197,7 +359,7 @@ def get_event(eventId):
 
 
 @app.route('/event/<eventId>/start', methods=['POST'])
-def start_event():
+def start_event_by_id(eventId):
     print('Starting event')
     # run CV and all that here
 
@@ -225,6 +387,31 @@ def get_events():
     return jsonify(events), 200
 
 
+def process_guest_video(file_path, event_id):
+    # Runs on a job worker: make the upload readable (re-encoding only if
+    # nothing cheaper works), pick enrollment frames in a single pass over the
+    # clip and add their embeddings to the event's shard. While the event is
+    # running that shard is the live gallery, so the guest is recognized
+    # from the next frame on.
+    from enrollment import extract_enrollment, save_enrollment_frames
+
+    video_path, ingest_report = prepare_video(file_path)
+    print(f"Ingested {file_path} via {ingest_report['path']}: {ingest_report['timings']}")
+    enrollment = extract_enrollment(video_path, 15)
+
+    name, _ = os.path.splitext(os.path.basename(file_path))
+    frame_paths = save_enrollment_frames(
+        enrollment, os.path.dirname(file_path), name)
+    label = label_from_path(name)
+    live = False
+    if len(enrollment):
+        shards.append(event_id, label, enrollment.embeddings)
+        live = str(event_id) in shards
+
+    return {'frames': len(frame_paths), 'label': label, 'live': live,
+            'ingest': ingest_report}
+
+
 @app.route('/register-guest', methods=['POST'])
 def register_event():
     data = json.loads(request.form.get('guestData'))
@@ -234,23 +421,48 @@ def register_event():
     file = request.files['guestVideo']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-    filename = ''
-    if file:
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        convert_mov_to_mp4(file_path)
-        extract_frames_from_mp4(file_path, 15)
+    filename = secure_filename(file.filename)
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file.save(file_path)
+
     db = get_db()
     cursor = db.cursor()
     cursor.execute(
         "INSERT INTO guests (eventId, name, email, videoName) VALUES (?, ?, ?, ?)", (eventId, name, email, filename))
+
+    # Conversion and enrollment take far longer than the app's request
+    # timeout, so they run in the background and the client polls /jobs/<id>
+    try:
+        job_id = jobs.submit(process_guest_video, file_path, eventId,
+                             kind='register-guest')
+    except QueueFull:
+        db.rollback()
+        os.remove(file_path)
+        return jsonify({'error': 'Registration queue is full, try again shortly'}), 503
     db.commit()
 
-    return jsonify({'message': 'Guest registered successfully!'}), 201
+    return jsonify({'message': 'Guest registered successfully!', 'jobId': job_id,
+                    'statusUrl': f'/jobs/{job_id}'}), 202
+
+
+@app.route('/models', methods=['GET'])
+def get_models():
+    # Models warmed up in this process, with how long each step took
+    return jsonify(warm_up_report()), 200
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
 
 
 if __name__ == '__main__':
     # Initialize the database before starting the server
     init_db()
+    # Build and warm up the models in the background so the first event
+    # and the first registration don't wait for them
+    jobs.submit(warm_up, kind='warm-up')
     app.run(host='0.0.0.0', debug=False)
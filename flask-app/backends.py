@@ -0,0 +1,240 @@
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+from deepface import DeepFace
+
+from gallery import IMAGE_EXTENSIONS, normalize_rows
+from models import get_model
+
+# Detectors return, for each face, a dict with 'facial_area' (x, y, w, h,
+# left_eye, right_eye) and 'confidence', plus an aligned 'face' crop when
+# asked to align. Embedders take a preprocessed (N, H, W, 3) float32 batch
+# and return (N, D) embeddings; input_shape is (width, height) like
+# DeepFace's models.
+
+
+class DeepFaceDetector:
+    """Any DeepFace detector backend: opencv, ssd, retinaface, yunet, ...
+
+    yunet is an ONNX model run by OpenCV's DNN module, so it is the cheap CPU
+    choice when opencv's Haar cascade misses too many faces."""
+
+    def __init__(self, detector_backend='opencv'):
+        self.name = detector_backend
+        self.model = get_model(detector_backend, task='face_detector')
+
+    def detect(self, image, align=False):
+        faces = DeepFace.extract_faces(
+            img_path=image,
+            detector_backend=self.name,
+            enforce_detection=False,  # Avoid error if no face is detected
+            align=align,
+            color_face='bgr'
+        )
+        # With enforce_detection off, "no face" comes back as the whole
+        # image with zero confidence
+        faces = [face for face in faces if face['confidence'] > 0]
+        if not align:
+            for face in faces:
+                del face['face']
+        return faces
+
+
+class KerasEmbedder:
+    """DeepFace's own TensorFlow/Keras model."""
+
+    def __init__(self, model_name='VGG-Face'):
+        self.name = f'keras:{model_name}'
+        self.model_name = model_name
+        self.model = get_model(model_name)
+        self.input_shape = self.model.input_shape
+        self.output_shape = self.model.output_shape
+
+    def embed(self, batch):
+        try:
+            embeddings = self.model.model(batch, training=False)
+        except TypeError:
+            # Non-Keras models (Dlib, SFace) only expose a per-image forward()
+            embeddings = [self.model.forward(img[np.newaxis]) for img in batch]
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """A face model exported to ONNX (see export_onnx() and quantize_int8()),
+    run on the CPU by ONNX Runtime.
+
+    intra_op_threads is how many threads one forward pass may use; 0 lets
+    ONNX Runtime pick one per physical core. On a door box that also decodes
+    video, leaving a core or two free usually gives steadier latency."""
+
+    def __init__(self, model_path, model_name='VGG-Face', intra_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, options, providers=['CPUExecutionProvider'])
+        self.name = f'onnx:{os.path.basename(model_path)}'
+        self.model_name = model_name
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        _, height, width, _ = model_input.shape  # exported NHWC, like Keras
+        self.input_shape = (width, height)
+        self.output_shape = self.session.get_outputs()[0].shape[-1]
+
+    def embed(self, batch):
+        return self.session.run(
+            None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+def export_onnx(model_name, output_path, opset=13):
+    # Convert DeepFace's Keras model to ONNX with a dynamic batch dimension.
+    # Needs tensorflow and tf2onnx, which only the machine doing the export
+    # has to have.
+    import tensorflow as tf
+    import tf2onnx
+
+    model = get_model(model_name)
+    width, height = model.input_shape
+    signature = (tf.TensorSpec((None, height, width, 3), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model.model, input_signature=signature,
+                               opset=opset, output_path=output_path)
+    print(f"Exported {model_name} to {output_path}")
+    return output_path
+
+
+class CalibrationBatches:
+    """Feeds preprocessed face batches to ONNX Runtime's static quantizer."""
+
+    def __init__(self, input_name, batches):
+        self.input_name = input_name
+        self.batches = iter(batches)
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize_int8(model_path, output_path, calibration=None):
+    # int8 weights. Without calibration data activations are quantized on
+    # the fly (dynamic); with a list of preprocessed face batches they are
+    # calibrated once up front (static QDQ), which is faster for conv nets.
+    from onnxruntime.quantization import (QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    if calibration is None:
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    else:
+        import onnx
+
+        input_name = onnx.load(model_path).graph.input[0].name
+        quantize_static(model_path, output_path,
+                        CalibrationBatches(input_name, calibration),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+    print(f"Quantized {model_path} to {output_path}")
+    return output_path
+
+
+def load_face_batches(image_dir, recognizer, batch_size=16, limit=256):
+    # Preprocessed face crops from the gallery images in image_dir, in
+    # batches, for calibration and validation
+    crops = []
+    for img_path in sorted(glob.glob(os.path.join(image_dir, '*'))):
+        if not img_path.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(img_path)
+        if image is None:
+            continue
+        crops.extend(recognizer.preprocess(face['face'])
+                     for face in recognizer.detect(image)[:1])
+        if len(crops) >= limit:
+            break
+    if not crops:
+        return []
+    crops = np.concatenate(crops)
+    return [crops[start:start + batch_size] for start in range(0, len(crops), batch_size)]
+
+
+def validate(reference, candidate, batches, repeats=3):
+    # How closely candidate's embeddings follow reference's on the same
+    # crops, and how much faster it is. nearest_agreement is the share of
+    # crops whose closest other crop is the same under both backends.
+    if not batches:
+        raise ValueError("No face crops to validate on")
+
+    def run(embedder):
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            embeddings = np.concatenate([embedder.embed(batch) for batch in batches])
+            timings.append(time.perf_counter() - started)
+        return normalize_rows(embeddings), float(np.median(timings))
+
+    expected, reference_time = run(reference)
+    actual, candidate_time = run(candidate)
+    cosine = np.sum(expected * actual, axis=1)
+
+    def nearest(embeddings):
+        similarities = embeddings @ embeddings.T
+        np.fill_diagonal(similarities, -np.inf)
+        return np.argmax(similarities, axis=1)
+
+    count = len(expected)
+    return {
+        'reference': reference.name,
+        'candidate': candidate.name,
+        'faces': count,
+        'cosine_mean': float(cosine.mean()),
+        'cosine_min': float(cosine.min()),
+        'cosine_p01': float(np.percentile(cosine, 1)),
+        'nearest_agreement': float(np.mean(nearest(expected) == nearest(actual))) if count > 1 else 1.0,
+        'reference_ms_per_face': 1000 * reference_time / count,
+        'candidate_ms_per_face': 1000 * candidate_time / count,
+        'speedup': reference_time / candidate_time,
+    }
+
+
+def main():
+    # python backends.py --model VGG-Face --output vgg_face.onnx --quantize --validate raw_data
+    parser = argparse.ArgumentParser(description='Export, quantize and validate ONNX face models')
+    parser.add_argument('--model', default='VGG-Face')
+    parser.add_argument('--output', required=True, help='fp32 .onnx path')
+    parser.add_argument('--quantize', action='store_true', help='also write an int8 <output>.int8.onnx')
+    parser.add_argument('--static', action='store_true', help='calibrate int8 activations on --validate images')
+    parser.add_argument('--validate', metavar='IMAGE_DIR', help='compare against TensorFlow on these images')
+    parser.add_argument('--threads', type=int, default=0, help='ONNX Runtime intra-op threads')
+    args = parser.parse_args()
+
+    from recognition import Recognizer
+
+    if not os.path.exists(args.output):
+        export_onnx(args.model, args.output)
+    recognizer = Recognizer(None, model_name=args.model, check_quality=False)
+    batches = load_face_batches(args.validate, recognizer) if args.validate else None
+
+    variants = [args.output]
+    if args.quantize:
+        quantized = os.path.splitext(args.output)[0] + '.int8.onnx'
+        quantize_int8(args.output, quantized, calibration=batches if args.static else None)
+        variants.append(quantized)
+
+    if batches:
+        for path in variants:
+            candidate = OnnxEmbedder(path, args.model, intra_op_threads=args.threads)
+            report = validate(recognizer.embedder, candidate, batches)
+            print(f"{report['candidate']}: cosine mean {report['cosine_mean']:.4f} "
+                  f"min {report['cosine_min']:.4f}, nearest agreement "
+                  f"{report['nearest_agreement']:.1%}, {report['candidate_ms_per_face']:.1f} ms/face "
+                  f"({report['speedup']:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
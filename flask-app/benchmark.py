@@ -0,0 +1,221 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from cameras import IngestManager
+from event_client import TTLCache
+from face_detection import COOLDOWN_PERIOD, build_camera, build_pipeline
+from gallery import IMAGE_EXTENSIONS, GalleryIndex, LiveGallery
+from models import warm_up
+from pipeline import BLOCK, DROP_OLDEST
+from recognition import Recognizer
+
+
+class DryRunActuator:
+    """Stands in for the thwarter: counts triggers, touches no serial port."""
+
+    def __init__(self):
+        self.fired = 0
+
+    def ready(self, target='default'):
+        return True
+
+    def fire(self, target='default'):
+        self.fired += 1
+        return True
+
+
+class DryRunEvents:
+    """Stands in for the attendee API: same per-name cooldown, no HTTP."""
+
+    def __init__(self, cooldown=COOLDOWN_PERIOD.total_seconds()):
+        self.recent = TTLCache(cooldown)
+        self.sent = 0
+
+    def should_send(self, name, now=None):
+        return self.recent.add(name, now)
+
+    def send(self, name, event_id, image=None, time=None):
+        self.sent += 1
+
+
+def synthetic_video(image_dir, output_path, fps=15, hold=2.0, gap=3.0, size=(1280, 720)):
+    # A doorway clip made from the gallery images: each image is shown for
+    # hold seconds, with gap seconds of empty doorway before it. The gap is
+    # longer than the motion gate's hold plus the tracker's max_age (1 s
+    # each), so the empty doorway is actually skipped and every face starts
+    # a new track.
+    images = sorted(path for path in glob.glob(os.path.join(image_dir, '*'))
+                    if path.lower().endswith(IMAGE_EXTENSIONS))
+    if not images:
+        raise ValueError(f"No images in {image_dir}")
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    empty = np.full((size[1], size[0], 3), 96, dtype=np.uint8)
+    for img_path in images:
+        image = cv2.imread(img_path)
+        if image is None:
+            continue
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        for _ in range(round(gap * fps)):
+            writer.write(empty)
+        for _ in range(round(hold * fps)):
+            writer.write(image)
+    writer.release()
+    return output_path
+
+
+def summarize(samples):
+    # Latency percentiles in milliseconds
+    if not samples:
+        return {'count': 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'count': len(ms), 'mean': float(ms.mean()), 'p50': float(p50),
+            'p95': float(p95), 'p99': float(p99), 'max': float(ms.max())}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sources, gallery, realtime=False, threshold=0.3, model_name='VGG-Face',
+        detector_backend='opencv', embed_backend=None):
+    # Push the clips through the live pipeline (minus hardware and HTTP) and
+    # measure it. As fast as possible, every frame is processed; realtime
+    # plays the clips at their frame rate and drops what recognition misses,
+    # like a live camera. Either way the motion gate, tracker, decisions and
+    # cooldowns run on clip time, so the counts don't depend on the machine.
+    warm_up(model_name, detector_backend)
+    recognizer = Recognizer(LiveGallery(gallery), threshold=threshold, model_name=model_name,
+                            detector_backend=detector_backend, embed_backend=embed_backend)
+    cameras = [build_camera({'name': f'clip{index}', 'source': source, 'realtime': realtime})
+               for index, source in enumerate(sources)]
+    manager = IngestManager(cameras)
+    actuator, events = DryRunActuator(), DryRunEvents()
+
+    stage_times = {}
+
+    def observer(name, seconds):
+        stage_times.setdefault(name, []).append(seconds)
+
+    pipeline = build_pipeline(recognizer, manager, actuator, events, observer=observer,
+                              policy=DROP_OLDEST if realtime else BLOCK)
+    done = pipeline.connect('decide', 'benchmark', maxsize=64, policy=BLOCK)
+
+    end_to_end, faces = [], []
+    started = time.perf_counter()
+    manager.start()
+    pipeline.start()
+    while True:
+        try:
+            packet = done.get(timeout=0.5)
+        except queue.Empty:
+            if done.closed:
+                break
+            continue
+        end_to_end.append(time.time() - packet['read_at'])
+        faces.append(len(packet['result'].boxes))
+    elapsed = time.perf_counter() - started
+    pipeline.stop()
+    pipeline.join(timeout=1)
+    manager.stop()
+
+    stats = pipeline.stats()
+    frames_read = sum(camera.frames_read for camera in cameras)
+    processed = len(end_to_end)
+    return {
+        'frames_read': frames_read,
+        'frames_processed': processed,
+        'frames_dropped': frames_read - processed,
+        'seconds': elapsed,
+        'fps': processed / elapsed if elapsed else 0.0,
+        'stages': {name: summarize(samples) for name, samples in stage_times.items()},
+        'end_to_end': summarize(end_to_end),
+        'detector_calls_per_frame': recognizer.detect_calls / processed if processed else 0.0,
+        'embedder_calls_per_frame': recognizer.embed_calls / processed if processed else 0.0,
+        'faces_per_frame': float(np.mean(faces)) if faces else 0.0,
+        'motion_skip_ratio': {camera.name: camera.gate.skip_ratio for camera in cameras},
+        'queues': stats['queues'],
+        'triggers': actuator.fired,
+        'sightings': events.sent,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    # python benchmark.py --synthetic raw_data --output bench.json
+    # python benchmark.py --clips door1.mp4 door2.mp4 --realtime --output bench.json
+    parser = argparse.ArgumentParser(description='Replay clips through the recognition pipeline')
+    parser.add_argument('--clips', nargs='*', default=[], help='recorded videos to replay')
+    parser.add_argument('--synthetic', metavar='IMAGE_DIR',
+                        help='build a clip from the images in IMAGE_DIR (e.g. raw_data)')
+    parser.add_argument('--gallery', default='raw_data', help='guest image directory')
+    parser.add_argument('--realtime', action='store_true', help='play clips at their frame rate')
+    parser.add_argument('--threshold', type=float, default=0.3)
+    parser.add_argument('--model', default='VGG-Face')
+    parser.add_argument('--detector', default='opencv')
+    parser.add_argument('--embed-backend', default=None, help='keras or onnx (see models.py)')
+    parser.add_argument('--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    clips = list(args.clips)
+    if args.synthetic:
+        clips.append(synthetic_video(args.synthetic, 'benchmark_synthetic.avi'))
+    if not clips:
+        parser.error('give --clips and/or --synthetic')
+
+    gallery = GalleryIndex.from_directory(args.gallery, model_name=args.model,
+                                          detector_backend=args.detector,
+                                          embed_backend=args.embed_backend)
+    results = run(clips, gallery, realtime=args.realtime, threshold=args.threshold,
+                  model_name=args.model, detector_backend=args.detector,
+                  embed_backend=args.embed_backend)
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'config': {'clips': clips, 'gallery': args.gallery, 'gallery_size': len(gallery),
+                   'realtime': args.realtime, 'threshold': args.threshold,
+                   'model': args.model, 'detector': args.detector,
+                   'embed_backend': args.embed_backend},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{results['frames_processed']} frames in {results['seconds']:.1f}s "
+          f"({results['fps']:.1f} fps), end-to-end p95 {results['end_to_end'].get('p95', 0):.1f} ms, "
+          f"peak RSS {results['peak_rss_mb'] or 0:.0f} MB -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
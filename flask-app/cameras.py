@@ -0,0 +1,187 @@
+import collections
+import threading
+import time
+
+import cv2
+
+ROUND_ROBIN = 'round_robin'
+ACTIVITY = 'activity'
+
+
+def open_capture(source):
+    # Webcam index (int or digit string), GStreamer pipeline (contains '!'),
+    # or anything FFmpeg can open: RTSP URL, file path, ...
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return cv2.VideoCapture(int(source))
+    if '!' in source:
+        return cv2.VideoCapture(source, cv2.CAP_GSTREAMER)
+    return cv2.VideoCapture(source)
+
+
+def is_live(source):
+    # Live sources are reopened when they drop; files just end
+    if isinstance(source, int) or source.isdigit() or '!' in source:
+        return True
+    return source.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))
+
+
+class Camera:
+    """One entrance: its capture, plus everything that must not be shared
+    between doors (motion gate, tracker, ROI, decision state, actuator).
+
+    For live sources a reader thread keeps only the newest frame, so a slow
+    consumer sees fresh frames instead of a backlog. Files hand over every
+    frame as fast as they are taken, unless realtime is set: then they play
+    at their recorded frame rate and behave like a live source. Frames from
+    files also carry their position in the recording, so a replay can be
+    timed by the clip instead of by how fast it is processed."""
+
+    def __init__(self, name, source, roi=None, gate=None, tracker=None,
+                 actuator=None, reconnect_delay=2.0, realtime=False):
+        self.name = name
+        self.source = source
+        self.roi = roi
+        self.gate = gate
+        self.tracker = tracker
+        self.actuator = actuator  # ActuatorController for this door, or None
+        self.state = {}  # per-door decision state, owned by the decide stage
+        self.reconnect_delay = reconnect_delay
+        self.realtime = realtime
+        self.frames_read = 0
+        self.frames_served = 0
+        self.last_served = 0.0
+        self.ended = False
+        self._frame = None
+        self._frame_time = None
+        self._frame_position = None
+        self._sequence = 0
+        self._served_sequence = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._reader = threading.Thread(target=self._read, name=f'camera-{name}', daemon=True)
+
+    def start(self):
+        self._reader.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+
+    def join(self, timeout=None):
+        self._reader.join(timeout)
+
+    def has_new_frame(self):
+        return self._sequence != self._served_sequence
+
+    def take(self):
+        # Newest unseen frame, its capture time and its position in seconds
+        # (None for live sources), or None
+        with self._lock:
+            if self._sequence == self._served_sequence:
+                return None
+            self._served_sequence = self._sequence
+            self.frames_served += 1
+            self.last_served = time.monotonic()
+            return self._frame, self._frame_time, self._frame_position
+
+    def activity(self):
+        # How busy the door looks: live tracks count most, then motion
+        score = 0.0
+        if self.tracker is not None:
+            score += len(self.tracker)
+        if self.gate is not None:
+            score += self.gate.changed
+        return score
+
+    def _read(self):
+        live = is_live(self.source)
+        cap = open_capture(self.source)
+        paced = not live and self.realtime
+        frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30)
+        started = time.monotonic()
+        while not self._stopping.is_set():
+            if paced:
+                # Hold each frame back until its place in the recording
+                delay = started + self.frames_read * frame_interval - time.monotonic()
+                if delay > 0:
+                    self._stopping.wait(delay)
+            elif not live:
+                # Files aren't real time: wait for the last frame to be
+                # taken instead of skipping ahead
+                while self.has_new_frame() and not self._stopping.is_set():
+                    self._stopping.wait(0.001)
+            ret, frame = cap.read()
+            if not ret:
+                cap.release()
+                if not live:
+                    break
+                print(f"Camera {self.name} dropped, reconnecting")
+                self._stopping.wait(self.reconnect_delay)
+                cap = open_capture(self.source)
+                continue
+            with self._lock:
+                self._frame = frame
+                self._frame_time = time.time()
+                self._frame_position = None if live else self.frames_read * frame_interval
+                self._sequence += 1
+            self.frames_read += 1
+        cap.release()
+        self.ended = True
+
+
+class IngestManager:
+    """Feeds frames from several cameras into one shared recognition backend.
+
+    next_frame() hands out the next camera with an unseen frame, either in
+    turn (round_robin) or preferring doors with people or motion in view
+    (activity). Under activity scheduling a door is never starved: its
+    priority grows with the time since it was last served."""
+
+    def __init__(self, cameras, schedule=ROUND_ROBIN, starvation_weight=2.0, poll_interval=0.005):
+        if schedule not in (ROUND_ROBIN, ACTIVITY):
+            raise ValueError(f"Unknown schedule: {schedule}")
+        self.cameras = list(cameras)
+        self.schedule = schedule
+        self.starvation_weight = starvation_weight  # priority per second waiting
+        self.poll_interval = poll_interval
+        self._order = collections.deque(self.cameras)
+
+    def start(self):
+        for camera in self.cameras:
+            camera.start()
+        return self
+
+    def stop(self):
+        for camera in self.cameras:
+            camera.stop()
+        for camera in self.cameras:
+            camera.join(timeout=1)
+
+    def next_frame(self, timeout=None):
+        # (camera, frame, capture time, position), or None once every camera
+        # has ended or the timeout passed
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ready = [camera for camera in self._order if camera.has_new_frame()]
+            if ready:
+                camera = self._pick(ready)
+                taken = camera.take()
+                if taken is not None:
+                    return (camera,) + taken
+                continue
+            if all(camera.ended for camera in self.cameras):
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _pick(self, ready):
+        if self.schedule == ROUND_ROBIN:
+            camera = ready[0]
+            # Served camera goes to the back of the line
+            self._order.remove(camera)
+            self._order.append(camera)
+            return camera
+        now = time.monotonic()
+        return max(ready, key=lambda camera: camera.activity()
+                   + self.starvation_weight * (now - camera.last_served))
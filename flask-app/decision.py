@@ -0,0 +1,124 @@
+import numpy as np
+
+UNDECIDED, GUEST, INTRUDER = 0, 1, 2
+DECISIONS = np.array(['undecided', 'guest', 'intruder'], dtype=object)
+
+# Track id of an unused row. Not 0: FrameRecognition uses 0 for "not tracked".
+FREE = -1
+
+
+class DecisionEngine:
+    """Decides per track whether the person is a guest, an intruder or still
+    undecided, from the stream of per-frame recognitions.
+
+    Each track keeps two numbers: how many seconds it has been seen matching
+    the gallery and how many seconds not matching, both decaying with
+    half_life. Every sighting counts for the time since the track's previous
+    one (at most max_gap), so the evidence grows at the same rate at 5 fps as
+    at 30 fps. A track is decided once it has min_evidence seconds of
+    evidence and its match share reaches accept (guest) or falls to reject
+    (intruder); it only goes back to undecided when the share moves margin
+    past that threshold again.
+
+    State lives in preallocated arrays with one row per track and is only
+    touched by update(), which takes the time explicitly, so a recorded
+    stream of sightings always replays to the same decisions."""
+
+    def __init__(self, half_life=1.5, min_evidence=0.5, accept=0.7, reject=0.3,
+                 margin=0.15, max_gap=0.5, max_age=2.0, capacity=16):
+        self.decay = np.log(2) / half_life
+        self.min_evidence = min_evidence
+        self.accept = accept
+        self.reject = reject
+        self.margin = margin
+        self.max_gap = max_gap
+        self.max_age = max_age
+        self._rows = {}  # track id -> row
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        used = len(getattr(self, 'ids', ()))
+        grown = {
+            'ids': np.full(capacity, FREE, dtype=np.int64),
+            'matched': np.zeros(capacity, dtype=np.float64),  # seconds
+            'unmatched': np.zeros(capacity, dtype=np.float64),
+            'seen': np.zeros(capacity, dtype=np.float64),
+            'decisions': np.zeros(capacity, dtype=np.int8),
+            'labels': np.full(capacity, None, dtype=object),
+        }
+        for name, array in grown.items():
+            if used:
+                array[:used] = getattr(self, name)
+            setattr(self, name, array)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def row(self, track_id, now):
+        row = self._rows.get(track_id)
+        if row is None:
+            free = np.flatnonzero(self.ids == FREE)
+            if not len(free):
+                self._allocate(2 * len(self.ids))
+                free = np.flatnonzero(self.ids == FREE)
+            row = self._rows[track_id] = int(free[0])
+            self.ids[row] = track_id
+            self.matched[row] = self.unmatched[row] = 0.0
+            self.seen[row] = now
+            self.decisions[row] = UNDECIDED
+            self.labels[row] = None
+        return row
+
+    def update(self, track_ids, recognized, labels, now):
+        # Fold one frame's sightings in. track_ids, recognized and labels are
+        # parallel per face, as in FrameRecognition. Returns each face's
+        # decision name and whether it changed with this frame.
+        self.expire(now)
+        if not len(track_ids):
+            return np.zeros(0, dtype=object), np.zeros(0, dtype=bool)
+        rows = np.array([self.row(int(track_id), now) for track_id in track_ids], dtype=np.int64)
+        recognized = np.asarray(recognized, dtype=bool)
+        labels = np.asarray(labels, dtype=object)
+
+        # A track re-verified as someone else starts over as that person
+        previous = self.labels[rows]
+        switched = recognized & np.not_equal(previous, None) & (previous != labels)
+        self.matched[rows[switched]] = 0.0
+        self.labels[rows[recognized]] = labels[recognized]
+
+        elapsed = np.maximum(now - self.seen[rows], 0.0)
+        kept = np.exp(-self.decay * elapsed)
+        observed = np.minimum(elapsed, self.max_gap)
+        matched = self.matched[rows] * kept + np.where(recognized, observed, 0.0)
+        unmatched = self.unmatched[rows] * kept + np.where(recognized, 0.0, observed)
+        self.matched[rows], self.unmatched[rows] = matched, unmatched
+        self.seen[rows] = now
+
+        evidence = matched + unmatched
+        share = np.divide(matched, evidence, out=np.zeros_like(evidence), where=evidence > 0)
+        before = self.decisions[rows]
+        decisions = before.copy()
+        decisions[switched & (decisions == GUEST)] = UNDECIDED
+        decisions[(decisions == GUEST) & (share < self.accept - self.margin)] = UNDECIDED
+        decisions[(decisions == INTRUDER) & (share > self.reject + self.margin)] = UNDECIDED
+        ready = (decisions == UNDECIDED) & (evidence >= self.min_evidence)
+        decisions[ready & (share >= self.accept)] = GUEST
+        decisions[ready & (share <= self.reject)] = INTRUDER
+        self.decisions[rows] = decisions
+        return DECISIONS[decisions], decisions != before
+
+    def expire(self, now):
+        # Free the rows of tracks not seen for max_age seconds
+        stale = np.flatnonzero((self.ids != FREE) & (now - self.seen > self.max_age))
+        for row in stale:
+            del self._rows[int(self.ids[row])]
+        self.ids[stale] = FREE
+        self.labels[stale] = None
+
+    def decision(self, track_id):
+        row = self._rows.get(track_id)
+        return DECISIONS[UNDECIDED] if row is None else DECISIONS[self.decisions[row]]
+
+    def label(self, track_id):
+        row = self._rows.get(track_id)
+        return None if row is None else self.labels[row]
@@ -0,0 +1,98 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from quality import face_quality
+from recognition import Recognizer
+
+
+class Enrollment:
+    """Frames chosen from a registration clip, with their face crops and
+    embeddings, in clip order."""
+
+    def __init__(self, frame_indices, frames, crops, embeddings):
+        self.frame_indices = frame_indices
+        self.frames = frames
+        self.crops = crops
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+
+def extract_enrollment(video_path, num_frames=15, candidates_per_frame=3,
+                       max_candidates=60, time_budget=5.0, recognizer=None):
+    # Decode the clip once, front to back. Every few frames run the detector
+    # and score the face in memory (see quality.py), then keep the
+    # best-scoring frame from each of num_frames stretches of the clip so the
+    # gallery covers the guest's head turns. Only the chosen crops are
+    # embedded, in one batch.
+    if recognizer is None:
+        recognizer = Recognizer(gallery=None)
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if frame_count <= 0:
+        cap.release()
+        print(f"Error: {video_path} contains no frames.")
+        return Enrollment([], [], [], np.zeros((0, 0), dtype=np.float32))
+
+    # Spread the detector budget evenly over the clip
+    wanted = min(max_candidates, num_frames * candidates_per_frame)
+    stride = max(1, frame_count // wanted)
+
+    candidates = []  # (frame index, score, frame, face)
+    deadline = time.monotonic() + time_budget
+    frame_num = -1
+    while len(candidates) < max_candidates and time.monotonic() < deadline:
+        # grab() advances without converting the frame; only sampled frames
+        # are retrieved
+        if not cap.grab():
+            break
+        frame_num += 1
+        if frame_num % stride:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            continue
+        faces = recognizer.detect(frame)
+        if not faces:
+            continue
+        # The guest is the largest face in their own clip. Blurred, dark or
+        # turned-away frames are dropped before any embedding work.
+        face = max(faces, key=lambda f: f['facial_area']['w'] * f['facial_area']['h'])
+        quality = face_quality(frame, face['facial_area'])
+        if not quality['ok']:
+            continue
+        candidates.append((frame_num, quality['score'], frame, face))
+    cap.release()
+
+    if not candidates:
+        print(f"Error: no usable faces found in {video_path}.")
+        return Enrollment([], [], [], np.zeros((0, 0), dtype=np.float32))
+
+    # Best candidate from each stretch of the clip
+    bins = np.array_split(np.arange(len(candidates)), min(num_frames, len(candidates)))
+    chosen = [candidates[max(indices, key=lambda i: candidates[i][1])] for indices in bins]
+
+    crops = [face['face'] for _, _, _, face in chosen]
+    embeddings = recognizer.embed(crops)
+    return Enrollment(
+        frame_indices=[frame_num for frame_num, _, _, _ in chosen],
+        frames=[frame for _, _, frame, _ in chosen],
+        crops=[(crop * 255).astype(np.uint8) for crop in crops],
+        embeddings=embeddings
+    )
+
+
+def save_enrollment_frames(enrollment, output_dir, name):
+    # Keep the chosen frames as <name>_frame<N>.jpg, the gallery's naming
+    # convention, so GalleryIndex.from_directory picks them up on restart
+    paths = []
+    for frame_num, frame in zip(enrollment.frame_indices, enrollment.frames):
+        img_path = os.path.join(output_dir, f'{name}_frame{frame_num}.jpg')
+        cv2.imwrite(img_path, frame)
+        paths.append(img_path)
+    return paths
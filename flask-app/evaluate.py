@@ -0,0 +1,163 @@
+import argparse
+import json
+
+import numpy as np
+
+from gallery import GalleryIndex
+
+# Targets for the recommended thresholds: the most permissive threshold whose
+# false accept rate stays under each of these
+FAR_TARGETS = (0.001, 0.01, 0.05)
+
+
+def pair_distances(index):
+    # Cosine distances of every unordered pair of gallery rows, split into
+    # genuine (same label) and impostor (different labels) pairs, plus the
+    # row indices of each pair
+    distances = 1.0 - index.matrix @ index.matrix.T
+    first, second = np.triu_indices(len(index), k=1)
+    pair = distances[first, second]
+    same = index.labels[first] == index.labels[second]
+    return pair, same, first, second
+
+
+def sweep(genuine, impostor, thresholds):
+    # FAR and FRR at each threshold, for the rule "accept if distance <
+    # threshold" that Recognizer uses
+    genuine, impostor = np.sort(genuine), np.sort(impostor)
+    far = np.searchsorted(impostor, thresholds, side='left') / max(len(impostor), 1)
+    frr = 1.0 - np.searchsorted(genuine, thresholds, side='left') / max(len(genuine), 1)
+    return far, frr
+
+
+def recommend(thresholds, far, frr):
+    # Equal error rate point and the loosest threshold meeting each FAR target.
+    # When the classes separate cleanly many thresholds tie; take the middle.
+    gap = np.abs(far - frr)
+    tied = np.flatnonzero(gap == gap.min())
+    eer_at = int(tied[len(tied) // 2])
+    recommended = {'eer': {'threshold': float(thresholds[eer_at]),
+                           'far': float(far[eer_at]), 'frr': float(frr[eer_at])}}
+    for target in FAR_TARGETS:
+        within = np.flatnonzero(far <= target)
+        if len(within):
+            at = within[-1]  # FAR only grows with the threshold
+            recommended[f'far<={target:g}'] = {'threshold': float(thresholds[at]),
+                                               'far': float(far[at]), 'frr': float(frr[at])}
+    return recommended
+
+
+def per_identity(index, pair, same, first, second, threshold):
+    # FRR over each identity's genuine pairs and FAR over every impostor pair
+    # it takes part in
+    accepted = pair < threshold
+    report = {}
+    for label in np.unique(index.labels):
+        mine = (index.labels[first] == label) | (index.labels[second] == label)
+        genuine, impostor = mine & same, mine & ~same
+        report[str(label)] = {
+            'images': int(np.sum(index.labels == label)),
+            'genuine_pairs': int(genuine.sum()),
+            'impostor_pairs': int(impostor.sum()),
+            'frr': float(np.mean(~accepted[genuine])) if genuine.any() else None,
+            'far': float(np.mean(accepted[impostor])) if impostor.any() else None,
+        }
+    return report
+
+
+def rank_one(index, threshold):
+    # Leave-one-out identification as the live loop does it: each image's
+    # closest other image, accepted below threshold. Returns the share
+    # correctly recognized and the share wrongly recognized as someone else.
+    similarities = index.matrix @ index.matrix.T
+    np.fill_diagonal(similarities, -np.inf)
+    best = np.argmax(similarities, axis=1)
+    accepted = 1.0 - similarities[np.arange(len(index)), best] < threshold
+    correct = index.labels[best] == index.labels
+    return float(np.mean(accepted & correct)), float(np.mean(accepted & ~correct))
+
+
+def evaluate(index, step=0.001):
+    pair, same, first, second = pair_distances(index)
+    if not same.any() or same.all():
+        raise ValueError("Need at least two identities with two images each")
+    thresholds = np.arange(0.0, 2.0 + step, step)  # cosine distance spans [0, 2]
+    far, frr = sweep(pair[same], pair[~same], thresholds)
+    recommended = recommend(thresholds, far, frr)
+    eer_threshold = recommended['eer']['threshold']
+    identified, misidentified = rank_one(index, eer_threshold)
+    return {
+        'model': index.model_name,
+        'images': len(index),
+        'identities': int(len(np.unique(index.labels))),
+        'genuine_pairs': int(same.sum()),
+        'impostor_pairs': int((~same).sum()),
+        'recommended': recommended,
+        'per_identity': per_identity(index, pair, same, first, second, eer_threshold),
+        'rank_one_at_eer': {'recognized': identified, 'misidentified': misidentified},
+        # ROC is (far, 1 - frr); DET is (far, frr), usually on normal-deviate axes
+        'curves': {'threshold': thresholds.tolist(), 'far': far.tolist(), 'frr': frr.tolist()},
+    }
+
+
+def plot(report, path):
+    # ROC and DET curves side by side. Needs matplotlib.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from statistics import NormalDist
+
+    far = np.asarray(report['curves']['far'])
+    frr = np.asarray(report['curves']['frr'])
+    figure, (roc, det) = plt.subplots(1, 2, figsize=(11, 5))
+    roc.plot(far, 1 - frr)
+    roc.set(xscale='log', xlabel='False accept rate', ylabel='True accept rate', title='ROC')
+
+    # Normal-deviate axes; rates of exactly 0 or 1 have no deviate
+    probit = np.vectorize(lambda p: NormalDist().inv_cdf(min(max(p, 1e-6), 1 - 1e-6)))
+    det.plot(probit(far), probit(frr))
+    ticks = [0.001, 0.01, 0.05, 0.2, 0.5]
+    det.set(xticks=probit(ticks), xticklabels=ticks, yticks=probit(ticks), yticklabels=ticks,
+            xlabel='False accept rate', ylabel='False reject rate', title='DET')
+    for name, point in report['recommended'].items():
+        det.plot(probit(point['far']), probit(point['frr']), 'o', label=f"{name}: {point['threshold']:.3f}")
+    det.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+
+
+def main():
+    # python evaluate.py raw_data --output thresholds.json --plot thresholds.png
+    parser = argparse.ArgumentParser(description='Threshold sweep over labelled gallery images')
+    parser.add_argument('image_dir', nargs='?', default='raw_data')
+    parser.add_argument('--model', default='VGG-Face')
+    parser.add_argument('--detector', default='opencv')
+    parser.add_argument('--embed-backend', default=None, help='keras or onnx (see models.py)')
+    parser.add_argument('--output', default='thresholds.json')
+    parser.add_argument('--plot', help='also save ROC/DET curves as an image')
+    args = parser.parse_args()
+
+    # Embeddings are cached next to the images, so only new images are
+    # embedded on later runs
+    index = GalleryIndex.from_directory(args.image_dir, model_name=args.model,
+                                        detector_backend=args.detector,
+                                        embed_backend=args.embed_backend)
+    report = evaluate(index)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.plot:
+        plot(report, args.plot)
+
+    print(f"{report['images']} images, {report['identities']} identities, "
+          f"{report['genuine_pairs']} genuine / {report['impostor_pairs']} impostor pairs")
+    for name, point in report['recommended'].items():
+        print(f"  {name:>10}: threshold {point['threshold']:.3f} "
+              f"(FAR {point['far']:.2%}, FRR {point['frr']:.2%})")
+    for label, row in report['per_identity'].items():
+        frr = 'n/a' if row['frr'] is None else f"{row['frr']:.2%}"
+        far = 'n/a' if row['far'] is None else f"{row['far']:.2%}"
+        print(f"  {label:>10}: FRR {frr}, FAR {far} ({row['images']} images)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+import collections
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TTLCache:
+    """Keys that expire after ttl seconds, capped at maxsize entries
+    (oldest evicted first)."""
+
+    def __init__(self, ttl, maxsize=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            self._expire(self.clock())
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._expire(self.clock())
+            return key in self._entries
+
+    def add(self, key, now=None):
+        # Returns True if key was not already live, i.e. the caller owns it
+        with self._lock:
+            now = self.clock() if now is None else now
+            self._expire(now)
+            if key in self._entries:
+                return False
+            self._entries[key] = now + self.ttl
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def _expire(self, now):
+        # Entries are in insertion order, so expiry times are increasing
+        while self._entries:
+            key, expires_at = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+
+
+class AttendeeEventClient(threading.Thread):
+    """Sends attendee sightings to the Flask API from a background thread.
+
+    send() only enqueues. Events are coalesced into batches and posted over a
+    pooled session to /log-attendee/batch. Batches that cannot be delivered
+    are written to a spool directory and replayed once the server is back."""
+
+    def __init__(self, base_url='http://localhost:5000', cooldown=30,
+                 batch_size=20, flush_interval=1.0, max_pending=1000,
+                 spool_dir='spool', timeout=5, retry_interval=10, cache_size=1024):
+        super().__init__(name='attendee-events', daemon=True)
+        self.url = base_url.rstrip('/') + '/log-attendee/batch'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.recent = TTLCache(cooldown, maxsize=cache_size)
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.sent = 0
+        self.spooled = 0
+        self.dropped = 0
+        self._stopping = threading.Event()
+        self._next_retry = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def should_send(self, name, now=None):
+        # True at most once per cooldown period for each name
+        return self.recent.add(name, now)
+
+    def send(self, name, event_id, image=None, time=None):
+        event = {
+            "name": name,
+            "event_id": event_id,
+            "time": time,
+            "image": image
+        }
+        try:
+            self.pending.put_nowait(event)
+        except queue.Full:
+            # Never block the caller; the spool takes the overflow instead
+            self._spool([event])
+        return True
+
+    def backlog(self):
+        return self.pending.qsize() + len(self._spool_files())
+
+    def close(self, timeout=None):
+        self._stopping.set()
+        self.join(timeout)
+
+    def run(self):
+        while not (self._stopping.is_set() and self.pending.empty()):
+            batch = self._next_batch()
+            if batch:
+                if self._post(batch):
+                    self._replay_spool()
+                else:
+                    self._spool(batch)
+                    self._next_retry = time.monotonic() + self.retry_interval
+            elif time.monotonic() >= self._next_retry:
+                self._replay_spool()
+        self.session.close()
+
+    def _next_batch(self):
+        # Wait for one event, then collect more until the batch is full or
+        # flush_interval has passed
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _post(self, batch):
+        try:
+            response = self.session.post(self.url, json=batch, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Error during sending attendee events: {e}")
+            return False
+        if response.status_code >= 500:
+            print(f"Failed to send attendee events: {response.status_code}")
+            return False
+        if response.status_code >= 400:
+            # The server rejected the batch itself; retrying won't help
+            print(f"Attendee events rejected: {response.status_code}")
+            self.dropped += len(batch)
+            return True
+        self.sent += len(batch)
+        return True
+
+    def _spool_files(self):
+        return sorted(glob.glob(os.path.join(self.spool_dir, '*.jsonl')))
+
+    def _spool(self, batch):
+        # Written under a temporary name and renamed, so the replay (on the
+        # client thread) and a crash mid-write never see half a file. Both
+        # send() and run() spool, hence the thread id in the name.
+        path = os.path.join(self.spool_dir, f'{time.time_ns()}-{threading.get_ident()}.jsonl')
+        try:
+            with open(path + '.tmp', 'w') as f:
+                for event in batch:
+                    f.write(json.dumps(event) + '\n')
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Error spooling attendee events: {e}")
+            self.dropped += len(batch)
+            return
+        self.spooled += len(batch)
+
+    def _replay_spool(self):
+        # Oldest first; stop at the first failure and keep the rest on disk
+        for path in self._spool_files():
+            try:
+                with open(path) as f:
+                    batch = [json.loads(line) for line in f if line.strip()]
+            except (OSError, ValueError) as e:
+                # Unreadable (e.g. cut short by a power loss): set it aside
+                # rather than let it stop the client thread
+                print(f"Skipping bad spool file {path}: {e}")
+                self._set_aside(path)
+                continue
+            if batch and not self._post(batch):
+                self._next_retry = time.monotonic() + self.retry_interval
+                return
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing spool file {path}: {e}")
+
+    def _set_aside(self, path):
+        try:
+            os.replace(path, os.path.splitext(path)[0] + '.bad')
+        except OSError as e:
+            print(f"Error moving bad spool file {path}: {e}")
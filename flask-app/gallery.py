@@ -0,0 +1,243 @@
+import os
+import re
+import threading
+
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+CACHE_NAME = 'gallery_{embedder}.npz'
+MIN_CAPACITY = 64  # rows reserved the first time an index is extended
+
+
+def label_from_path(img_path):
+    # Guest images are saved as <name>_frame<N>.jpg
+    return os.path.basename(img_path).split('_')[0]
+
+
+def normalize_rows(matrix):
+    # L2-normalize every row so a dot product is the cosine similarity
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms)
+
+
+def file_key(embedder_name):
+    # Embedder name (e.g. 'onnx:vgg_face.int8.onnx') as part of a file name.
+    # Caches and shards are keyed by it, so rows from different backends
+    # never end up in one index.
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', embedder_name)
+
+
+def embed_image(img_path, recognizer):
+    # Embed the largest face in a gallery image, or None if there isn't one.
+    # Goes through the recognizer's detector and embedder, so gallery rows
+    # come from the same backend and crops as the live queries.
+    import cv2
+
+    image = cv2.imread(img_path)
+    if image is None:
+        raise ValueError("Can't read image")
+    faces = recognizer.detect(image)
+    if not faces:
+        return None
+    face = max(faces, key=lambda face: face['facial_area']['w'] * face['facial_area']['h'])
+    return recognizer.embed([face['face']])[0]
+
+
+class RowStore:
+    """Over-allocated embedding and label arrays shared by GalleryIndex
+    views. Rows past filled are spare capacity."""
+
+    def __init__(self, matrix, labels):
+        self.matrix = matrix
+        self.labels = labels
+        self.filled = len(labels)
+        self.lock = threading.Lock()  # taken by writers only
+
+    @classmethod
+    def allocate(cls, capacity, dim):
+        store = cls(np.zeros((capacity, dim), dtype=np.float32),
+                    np.empty(capacity, dtype=object))
+        store.filled = 0
+        return store
+
+
+class GalleryIndex:
+    """Guest embeddings held as one pre-normalized matrix with a parallel
+    label array, so matching a face is a single matrix-vector product.
+
+    An index never changes once built: extend() returns a new one. matrix and
+    labels are views of the first len() rows of a RowStore, so an extended
+    index can share its rows with the one it came from."""
+
+    def __init__(self, embeddings, labels, model_name='VGG-Face'):
+        labels = np.asarray(labels, dtype=object)
+        if len(labels) == 0:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        else:
+            matrix = normalize_rows(embeddings)
+        if len(matrix) != len(labels):
+            raise ValueError("Every embedding needs exactly one label")
+        self._store = RowStore(matrix, labels)
+        self.matrix = matrix
+        self.labels = labels
+        self.model_name = model_name
+
+    @classmethod
+    def view(cls, store, count, model_name):
+        index = cls.__new__(cls)
+        index._store = store
+        index.matrix = store.matrix[:count]
+        index.labels = store.labels[:count]
+        index.model_name = model_name
+        return index
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def nbytes(self):
+        # Memory held, including spare rows reserved for later extends
+        return self._store.matrix.nbytes + sum(len(label) for label in self.labels)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['embeddings'], data['labels'].astype(object),
+                       model_name=str(data['model_name']))
+
+    def save(self, path):
+        # Written to a temporary file first so a reader never sees half a file
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, embeddings=self.matrix, labels=self.labels.astype(str),
+                     model_name=self.model_name)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_directory(cls, db_path, model_name='VGG-Face', detector_backend='opencv',
+                       embed_backend=None):
+        # Embed every guest image once. Results are cached next to the images
+        # keyed by file name and mtime, so a restart only embeds new files.
+        from recognition import Recognizer  # loads the models
+
+        recognizer = Recognizer(None, model_name=model_name, detector_backend=detector_backend,
+                                embed_backend=embed_backend)
+        embedder_name = recognizer.embedder.name
+        cache_path = os.path.join(
+            db_path, CACHE_NAME.format(embedder=file_key(embedder_name)))
+        cached = {}
+        if os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=True) as data:
+                for key, embedding in zip(data['keys'], data['embeddings']):
+                    cached[tuple(key)] = embedding
+
+        keys, embeddings, labels = [], [], []
+        for filename in sorted(os.listdir(db_path)):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            img_path = os.path.join(db_path, filename)
+            key = (filename, str(os.path.getmtime(img_path)))
+            embedding = cached.get(key)
+            if embedding is None:
+                try:
+                    embedding = embed_image(img_path, recognizer)
+                except Exception as e:
+                    print(f"Error embedding gallery image {img_path}: {e}")
+                    continue
+                if embedding is None:
+                    print(f"No face found in gallery image {img_path}")
+                    continue
+            keys.append(key)
+            embeddings.append(embedding)
+            labels.append(label_from_path(filename))
+
+        if keys != list(cached.keys()):
+            np.savez(cache_path,
+                     keys=np.asarray(keys, dtype=object),
+                     embeddings=np.asarray(embeddings, dtype=np.float32))
+
+        return cls(embeddings, labels, model_name=embedder_name)
+
+    def extend(self, embeddings, labels):
+        # New index with extra rows; this one is left untouched. When this is
+        # the newest index on its store and there is spare capacity, the rows
+        # are written in place past the end of this view, so nothing existing
+        # is copied or re-embedded. Otherwise the rows move to a new store
+        # with room to double.
+        if len(labels) == 0:
+            return self
+        rows = normalize_rows(embeddings)
+        count, total = len(self), len(self) + len(rows)
+        store = self._store
+        with store.lock:
+            if (store.filled == count and total <= len(store.matrix)
+                    and store.matrix.shape[1] == rows.shape[1]):
+                store.matrix[count:total] = rows
+                store.labels[count:total] = labels
+                store.filled = total
+                return GalleryIndex.view(store, total, self.model_name)
+
+        grown = RowStore.allocate(max(MIN_CAPACITY, 2 * total), rows.shape[1])
+        if count:
+            grown.matrix[:count] = self.matrix
+            grown.labels[:count] = self.labels
+        grown.matrix[count:total] = rows
+        grown.labels[count:total] = labels
+        grown.filled = total
+        return GalleryIndex.view(grown, total, self.model_name)
+
+    def match(self, embedding):
+        # Best gallery label and its cosine distance for one face
+        labels, distances = self.match_many([embedding])
+        return labels[0], distances[0]
+
+    def match_many(self, embeddings):
+        # Best gallery label and cosine distance for each row of embeddings
+        queries = normalize_rows(embeddings)
+        if len(self) == 0:
+            count = len(queries)
+            return np.full(count, None, dtype=object), np.full(count, np.inf, dtype=np.float32)
+        similarities = queries @ self.matrix.T
+        best = np.argmax(similarities, axis=1)
+        distances = 1.0 - similarities[np.arange(len(queries)), best]
+        return self.labels[best], distances
+
+
+class LiveGallery:
+    """The gallery a running event matches against, growable while in use.
+
+    extend() builds the next GalleryIndex copy-on-write and publishes it with
+    a single reference swap. Matching reads whichever index is current without
+    taking a lock, so it never waits on an enrollment and never sees a
+    half-added guest."""
+
+    def __init__(self, index):
+        self.current = index
+        self._lock = threading.Lock()  # serializes writers only
+
+    def __len__(self):
+        return len(self.current)
+
+    @property
+    def model_name(self):
+        return self.current.model_name
+
+    @property
+    def nbytes(self):
+        return self.current.nbytes
+
+    def extend(self, embeddings, labels):
+        with self._lock:
+            self.current = self.current.extend(embeddings, labels)
+            return self.current
+
+    def save(self, path):
+        self.current.save(path)
+
+    def match(self, embedding):
+        return self.current.match(embedding)
+
+    def match_many(self, embeddings):
+        return self.current.match_many(embeddings)
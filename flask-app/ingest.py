@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import cv2
+
+# How an upload was made readable, cheapest first
+DIRECT = 'direct'  # OpenCV decodes the upload as-is
+REMUX = 'remux'  # streams copied into a new .mp4 container, no re-encode
+TRANSCODE = 'transcode'  # full re-encode to H.264, last resort
+
+
+def ffmpeg_path():
+    # System ffmpeg, or the copy bundled with moviepy's imageio-ffmpeg
+    path = shutil.which('ffmpeg')
+    if path is None:
+        try:
+            import imageio_ffmpeg
+            path = imageio_ffmpeg.get_ffmpeg_exe()
+        except (ImportError, RuntimeError):
+            path = None
+    return path
+
+
+def probe(video_path):
+    # Container and codec of the first video stream, via ffprobe when it's
+    # installed and OpenCV otherwise
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is not None:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'format=format_name:stream=codec_name,width,height',
+             '-of', 'json', video_path],
+            capture_output=True, text=True, timeout=30)
+        if result.returncode == 0:
+            info = json.loads(result.stdout)
+            stream = (info.get('streams') or [{}])[0]
+            return {
+                'container': info.get('format', {}).get('format_name'),
+                'codec': stream.get('codec_name'),
+                'width': stream.get('width'),
+                'height': stream.get('height'),
+            }
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC)) & 0xFFFFFFFF
+        codec = fourcc.to_bytes(4, 'little').decode('ascii', 'replace').strip('\x00 ') or None
+        return {
+            'container': os.path.splitext(video_path)[1].lstrip('.').lower() or None,
+            'codec': codec,
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None,
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None,
+        }
+    finally:
+        cap.release()
+
+
+def can_decode(video_path):
+    # True if OpenCV can open the file and decode its first frame
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return False
+        ret, _ = cap.read()
+        return ret
+    finally:
+        cap.release()
+
+
+def output_path(video_path, suffix):
+    return os.path.splitext(video_path)[0] + f'.{suffix}.mp4'
+
+
+def remux(video_path):
+    # Copy the video stream into an .mp4 container without re-encoding
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        return None
+    out_path = output_path(video_path, REMUX)
+    result = subprocess.run(
+        [ffmpeg, '-y', '-v', 'error', '-i', video_path,
+         '-map', '0:v:0', '-c', 'copy', '-movflags', '+faststart', out_path],
+        capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        print(f"Remux failed for {video_path}: {result.stderr.strip()}")
+        return None
+    return out_path
+
+
+def transcode(video_path):
+    # Full re-encode to H.264. Audio is dropped, and the fastest preset is
+    # enough because the frames only feed enrollment.
+    out_path = output_path(video_path, TRANSCODE)
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is not None:
+        result = subprocess.run(
+            [ffmpeg, '-y', '-v', 'error', '-i', video_path, '-map', '0:v:0',
+             '-c:v', 'libx264', '-preset', 'ultrafast', '-an', out_path],
+            capture_output=True, text=True, timeout=600)
+        if result.returncode != 0:
+            raise RuntimeError(f"Transcode failed for {video_path}: {result.stderr.strip()}")
+        return out_path
+
+    from moviepy.editor import VideoFileClip
+    with VideoFileClip(video_path, audio=False) as clip:
+        clip.write_videofile(out_path, codec='libx264', audio=False,
+                             preset='ultrafast', logger=None)
+    return out_path
+
+
+def prepare_video(video_path):
+    # Returns a path OpenCV can read plus a report of what it took: decode
+    # directly if possible, else remux, else re-encode
+    report = {'source': video_path, 'timings': {}}
+
+    def timed(step, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        report['timings'][step] = round(time.perf_counter() - start, 4)
+        return value
+
+    report['probe'] = timed('probe', probe, video_path)
+
+    if timed('decode_check', can_decode, video_path):
+        report['path'] = DIRECT
+        report['output'] = video_path
+        return video_path, report
+
+    remuxed = timed(REMUX, remux, video_path)
+    if remuxed is not None and timed('remux_decode_check', can_decode, remuxed):
+        report['path'] = REMUX
+        report['output'] = remuxed
+        return remuxed, report
+    if remuxed is not None:
+        os.remove(remuxed)
+
+    transcoded = timed(TRANSCODE, transcode, video_path)
+    report['path'] = TRANSCODE
+    report['output'] = transcoded
+    return transcoded, report
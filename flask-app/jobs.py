@@ -0,0 +1,79 @@
+import collections
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """Runs slow work (video conversion, enrollment) on a bounded pool of
+    worker threads. submit() returns a job id right away; status() reports
+    progress for the /jobs/<id> endpoint."""
+
+    def __init__(self, workers=2, max_pending=32, history=1000):
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='job')
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, kind='job', **kwargs):
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values()
+                          if job['status'] in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs already waiting")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'status': QUEUED,
+                'created': time.time(),
+                'started': None,
+                'finished': None,
+                'result': None,
+                'error': None,
+            }
+            self._prune()
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status=RUNNING, started=time.time())
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, finished=time.time(), error=str(e))
+        else:
+            self._update(job_id, status=DONE, finished=time.time(), result=result)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
@@ -0,0 +1,195 @@
+import bisect
+import threading
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+FACE_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """One metric family; a value per combination of label values. Updating
+    it takes a lock and a dict lookup, so it is cheap enough for every frame."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def set(self, value, **labels):
+        # Also used by collectors to publish totals kept elsewhere
+        with self._lock:
+            self.values[self.key(labels)] = value
+
+    def clear(self):
+        with self._lock:
+            self.values.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{format_labels(self.labels, key)} {format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self.values.get(key)
+            if state is None:
+                # per-bucket counts (last one is +Inf), sum
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = format_labels(self.labels, key, [('le', format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """All metrics of the process. Collectors are called on every scrape to
+    refresh values that are cheaper to read than to track (queue depths,
+    gallery size, HTTP backlog)."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.add(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector):
+        with self._lock:
+            self.collectors.append(collector)
+        return collector
+
+    def remove_collector(self, collector):
+        with self._lock:
+            if collector in self.collectors:
+                self.collectors.remove(collector)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self.collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Recognition loop
+STAGE_SECONDS = REGISTRY.histogram(
+    'getbounced_stage_seconds', 'Time spent on one item in each pipeline stage', ('stage',))
+FRAMES = REGISTRY.counter(
+    'getbounced_frames_total',
+    'Frames per camera: captured, processed (detector ran), skipped (motion gate) '
+    'or dropped (replaced by a newer frame before recognition took it)',
+    ('camera', 'outcome'))
+QUEUE_DROPPED = REGISTRY.counter(
+    'getbounced_queue_dropped_total', 'Items dropped by each full pipeline queue', ('queue',))
+QUEUE_DEPTH = REGISTRY.gauge(
+    'getbounced_queue_depth', 'Items waiting in each pipeline queue', ('queue',))
+FACES_PER_FRAME = REGISTRY.histogram(
+    'getbounced_faces_per_frame', 'Faces detected in each processed frame', (), FACE_BUCKETS)
+GALLERY_SIZE = REGISTRY.gauge(
+    'getbounced_gallery_embeddings', 'Embeddings in the live gallery')
+DECISIONS = REGISTRY.counter(
+    'getbounced_decisions_total', 'Tracks newly decided guest, intruder or undecided',
+    ('camera', 'decision'))
+ACTUATOR_TRIGGERS = REGISTRY.counter(
+    'getbounced_actuator_triggers_total', 'Times the thwarter was fired', ('camera',))
+
+# Attendee API client
+EVENTS_BACKLOG = REGISTRY.gauge(
+    'getbounced_event_backlog', 'Sightings queued or spooled, not yet delivered')
+EVENTS = REGISTRY.counter(
+    'getbounced_events_total', 'Sightings by outcome: sent, spooled or dropped', ('outcome',))
+
+
+def observe_stage(stage, seconds):
+    # pipeline.Stage observer
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def serve(registry=REGISTRY, host='0.0.0.0', port=9100):
+    # /metrics on its own port, see sidecar.serve()
+    import sidecar
+
+    return sidecar.serve({'/metrics': lambda: (CONTENT_TYPE, registry.render().encode())},
+                         host, port, name='metrics')
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# DeepFace keeps a module-level model cache, but filling it isn't thread
+# safe: the live loop and an enrollment job starting together would each
+# build the same model and load its weights. Everything goes through
+# get_model() instead, so each model is built once per process. Models built
+# here also land in DeepFace's cache, so DeepFace.represent() reuses them.
+_models = {}
+_build_lock = threading.Lock()
+_backend_lock = threading.Lock()  # backends build their models via get_model()
+
+# Which implementation embeds faces: 'keras' runs DeepFace's TensorFlow model,
+# 'onnx' runs ONNX_MODEL_PATH (e.g. an int8 file made with backends.py) on
+# ONNX Runtime with ONNX_THREADS intra-op threads (0 = one per core)
+EMBED_BACKEND = os.environ.get('EMBED_BACKEND', 'keras')
+ONNX_MODEL_PATH = os.environ.get('ONNX_MODEL_PATH', '')
+ONNX_THREADS = int(os.environ.get('ONNX_THREADS', 0))
+
+# Warm-up reports by (model_name, detector_backend)
+_warm = {}
+_warm_lock = threading.Lock()
+
+
+def get_model(model_name, task='facial_recognition'):
+    key = (task, model_name)
+    model = _models.get(key)
+    if model is None:
+        with _build_lock:
+            model = _models.get(key)
+            if model is None:
+                from deepface import DeepFace  # loads TensorFlow
+
+                model = _models[key] = DeepFace.build_model(model_name, task=task)
+    return model
+
+
+def get_backend(key, build):
+    backend = _models.get(key)
+    if backend is None:
+        with _backend_lock:
+            backend = _models.get(key)
+            if backend is None:
+                backend = _models[key] = build()
+    return backend
+
+
+def get_detector(detector_backend='opencv'):
+    from backends import DeepFaceDetector
+
+    return get_backend(('detector', detector_backend),
+                       lambda: DeepFaceDetector(detector_backend))
+
+
+def get_embedder(model_name='VGG-Face', backend=None):
+    from backends import KerasEmbedder, OnnxEmbedder
+
+    backend = backend or EMBED_BACKEND
+    if backend == 'keras':
+        return get_backend(('embedder', backend, model_name),
+                           lambda: KerasEmbedder(model_name))
+    if backend == 'onnx':
+        return get_backend(('embedder', backend, model_name),
+                           lambda: OnnxEmbedder(ONNX_MODEL_PATH, model_name,
+                                                intra_op_threads=ONNX_THREADS))
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def warm_up(model_name='VGG-Face', detector_backend='opencv'):
+    # Build the detector and embedder and run a dummy frame through both, so
+    # the first guest at the door doesn't pay for loading weights and the
+    # first forward pass. Only the first call per model pair does any work;
+    # later calls return its report.
+    key = (model_name, detector_backend)
+    with _warm_lock:
+        if key in _warm:
+            return _warm[key]
+        from recognition import Recognizer  # recognition imports this module
+
+        started = time.perf_counter()
+        get_detector(detector_backend)
+        recognizer = Recognizer(None, model_name=model_name,
+                                detector_backend=detector_backend)
+        built = time.perf_counter()
+        recognizer.detect(np.full((480, 640, 3), 128, dtype=np.uint8))
+        detected = time.perf_counter()
+        width, height = recognizer.embedder.input_shape
+        recognizer.embed([np.zeros((height, width, 3), dtype=np.float32)])
+        embedded = time.perf_counter()
+
+        report = {'model': model_name, 'detector': detector_backend,
+                  'embedder': recognizer.embedder.name,
+                  'build': built - started, 'detect': detected - built,
+                  'embed': embedded - detected, 'total': embedded - started}
+        print(f"Warmed up {model_name} with {detector_backend} in {report['total']:.2f}s "
+              f"(build {report['build']:.2f}s, detect {report['detect']:.2f}s, "
+              f"embed {report['embed']:.2f}s)")
+        _warm[key] = report
+        return report
+
+
+def warm_up_report():
+    return list(_warm.values())
@@ -0,0 +1,69 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Decides whether a frame is worth running the face detector on.
+
+    Each frame is shrunk to a small blurred grayscale copy and compared with
+    a running-average background. Detection runs while enough of the scene
+    differs from the background, for hold seconds after that, and whenever
+    the caller says a track is still active. An empty doorway costs one
+    resize and one absdiff per frame."""
+
+    def __init__(self, width=160, threshold=25, min_changed=0.01, hold=1.0,
+                 learning_rate=0.05, roi=None, clock=time.monotonic):
+        self.width = width
+        self.roi = roi  # only watch this RegionOfInterest's bounding box
+        self.threshold = threshold  # per-pixel gray level change
+        self.min_changed = min_changed  # fraction of pixels that must change
+        self.hold = hold
+        self.learning_rate = learning_rate
+        self.clock = clock
+        self.background = None
+        self.frames = 0
+        self.skipped = 0
+        self.changed = 0.0  # fraction changed in the last frame
+        self._active_until = 0.0
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def small_gray(self, frame):
+        if self.roi is not None:
+            x, y, w, h = self.roi.bounds(frame.shape)
+            frame = frame[y:y + h, x:x + w]
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_process(self, frame, active=False, now=None):
+        now = self.clock() if now is None else now
+        self.frames += 1
+        gray = self.small_gray(frame)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self._active_until = now + self.hold
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        self.changed = float(np.count_nonzero(diff > self.threshold)) / diff.size
+        # Slowly absorb lighting changes and anything that stays put
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+
+        if self.changed >= self.min_changed:
+            self._active_until = now + self.hold
+        if active or now < self._active_until:
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {'frames': self.frames, 'skipped': self.skipped,
+                'skip_ratio': self.skip_ratio, 'changed': self.changed}
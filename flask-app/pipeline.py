@@ -0,0 +1,180 @@
+import collections
+import queue
+import threading
+import time
+
+# What a full queue does with a new item
+DROP_OLDEST = 'drop_oldest'  # evict the stalest item, keep the new one
+DROP_NEWEST = 'drop_newest'  # discard the new item
+BLOCK = 'block'  # wait for the consumer to make room
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class BoundedQueue:
+    """Fixed-size queue between two stages with a configurable overflow policy."""
+
+    def __init__(self, maxsize=2, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item):
+        # Returns False if the item was dropped or the queue is closed
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.maxsize and not self.closed:
+                        self._cond.wait()
+                    if self.closed:
+                        return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        # Raises queue.Empty on timeout or once the queue is closed and drained
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items:
+                if self.closed:
+                    raise queue.Empty
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class Stage(threading.Thread):
+    """Worker that applies func to every item from its inbox and forwards the
+    result to each downstream queue. A stage without an inbox is a source:
+    func() is called repeatedly and returning None ends the pipeline.
+
+    observer, if given, is called as observer(stage name, seconds) after
+    every call to func."""
+
+    def __init__(self, name, func, inbox=None, observer=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.observer = observer
+        self.outboxes = []
+        self.processed = 0
+        self.errors = 0
+        self.stopping = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                if self.inbox is None:
+                    started = time.perf_counter()
+                    item = self.func()
+                    if item is None:
+                        break
+                    self.observe(started)
+                else:
+                    try:
+                        item = self.inbox.get(timeout=0.1)
+                    except queue.Empty:
+                        if self.inbox.closed:
+                            break
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        item = self.func(item)
+                    except Exception as e:
+                        self.errors += 1
+                        print(f"Error in pipeline stage {self.name}: {e}")
+                        continue
+                    self.observe(started)
+                self.processed += 1
+                if item is not None:
+                    for outbox, accept in self.outboxes:
+                        if accept is None or accept(item):
+                            outbox.put(item)
+        finally:
+            # Let downstream stages drain and exit
+            for outbox, _ in self.outboxes:
+                outbox.close()
+
+    def observe(self, started):
+        if self.observer is not None:
+            self.observer(self.name, time.perf_counter() - started)
+
+
+class Pipeline:
+    """Chain of stages, each on its own thread, joined by bounded queues.
+    Throughput is set by the slowest stage rather than the sum of all of them."""
+
+    def __init__(self, observer=None):
+        self.stages = {}
+        self.queues = {}
+        self.observer = observer  # passed to every Stage
+
+    def add_source(self, name, func):
+        self.stages[name] = Stage(name, func, observer=self.observer)
+        return self
+
+    def add_stage(self, name, func, after, maxsize=2, policy=DROP_OLDEST, accept=None):
+        inbox = self.connect(after, name, maxsize, policy, accept)
+        self.stages[name] = Stage(name, func, inbox, observer=self.observer)
+        return self
+
+    def connect(self, after, name, maxsize=2, policy=DROP_OLDEST, accept=None):
+        # Queue fed by stage `after`, optionally only with items accept()
+        # approves. Also used to read a stage's output from outside the
+        # pipeline (e.g. display on the main thread).
+        inbox = BoundedQueue(maxsize, policy)
+        self.stages[after].outboxes.append((inbox, accept))
+        self.queues[name] = inbox
+        return inbox
+
+    def start(self):
+        for stage in self.stages.values():
+            stage.start()
+        return self
+
+    def stop(self):
+        for stage in self.stages.values():
+            stage.stopping.set()
+        for inbox in self.queues.values():
+            inbox.close()
+
+    def join(self, timeout=None):
+        for stage in self.stages.values():
+            stage.join(timeout)
+
+    def stats(self):
+        return {
+            'stages': {name: {'processed': stage.processed, 'errors': stage.errors}
+                       for name, stage in self.stages.items()},
+            'queues': {name: {'depth': len(inbox), 'dropped': inbox.dropped}
+                       for name, inbox in self.queues.items()},
+        }
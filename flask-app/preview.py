@@ -0,0 +1,92 @@
+import threading
+import time
+
+import cv2
+
+BOUNDARY = 'frame'
+
+
+def annotate(frame, result, scale=1.0):
+    # Draw a box and label for every recognized face in place
+    for (x, y, w, h), person_name, distance, recognized in zip(
+            result.boxes, result.labels, result.distances, result.recognized):
+        if recognized:
+            x, y, w, h = (int(v * scale) for v in (x, y, w, h))
+            label = f"{person_name} (Dist: {distance:.2f})"
+            color = (0, 255, 0)  # Green for recognized
+            # Draw bounding box and label
+            cv2.rectangle(
+                frame, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(frame, label, (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2, cv2.LINE_AA)
+    return frame
+
+
+class PreviewServer:
+    """Low-rate MJPEG preview of the recognition loop.
+
+    render() is meant to run on its own pipeline stage, so resizing,
+    annotating and JPEG encoding never happen on the recognition thread. It
+    does nothing unless a client is connected to stream(), and it never
+    produces more than max_fps frames of at most max_width pixels."""
+
+    def __init__(self, max_fps=5, max_width=640, quality=70):
+        self.max_fps = max_fps
+        self.max_width = max_width
+        self.quality = quality
+        self.viewers = 0
+        self._jpeg = None
+        self._sequence = 0
+        self._last_render = 0.0
+        self._cond = threading.Condition()
+
+    def watching(self):
+        return self.viewers > 0
+
+    def render(self, packet):
+        now = time.monotonic()
+        if not self.watching() or now - self._last_render < 1.0 / self.max_fps:
+            return
+        self._last_render = now
+
+        frame = packet['frame']
+        scale = min(1.0, self.max_width / frame.shape[1])
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()  # other stages may still be reading it
+        annotate(frame, packet['result'], scale)
+
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._cond:
+            self._jpeg = buffer.tobytes()
+            self._sequence += 1
+            self._cond.notify_all()
+
+    def stream(self, timeout=10.0):
+        # multipart/x-mixed-replace body, one part per rendered frame
+        with self._cond:
+            self.viewers += 1
+        try:
+            seen = self._sequence
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._sequence != seen, timeout):
+                        return  # recognition isn't producing frames
+                    seen, jpeg = self._sequence, self._jpeg
+                yield (f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                       f'Content-Length: {len(jpeg)}\r\n\r\n').encode() + jpeg + b'\r\n'
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+
+def serve(preview, host='0.0.0.0', port=8081):
+    # /preview on its own port, see sidecar.serve()
+    import sidecar
+
+    content_type = f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+    return sidecar.serve({'/preview': lambda: (content_type, preview.stream())},
+                         host, port, name='preview')
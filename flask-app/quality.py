@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+# Faces are scored on a fixed-size grayscale copy so sharpness is comparable
+# between near and far faces, and scoring costs the same for every face
+SCORE_SIZE = 96
+
+# Defaults for what counts as usable. A face failing any of these is skipped
+# before it ever reaches the embedding model.
+MIN_FACE_SIZE = 48  # pixels, shorter side of the detector box
+MIN_SHARPNESS = 40.0  # Laplacian variance
+MIN_BRIGHTNESS = 40.0  # mean gray level
+MAX_BRIGHTNESS = 215.0
+MAX_CLIPPED = 0.25  # fraction of pixels at 0 or 255
+MAX_YAW = 0.35  # eye midpoint offset from box centre, in eye distances
+MAX_ROLL = 25.0  # degrees
+
+
+def region(frame, facial_area):
+    x, y = max(0, int(facial_area['x'])), max(0, int(facial_area['y']))
+    return frame[y:y + int(facial_area['h']), x:x + int(facial_area['w'])]
+
+
+def pose(facial_area):
+    # Approximate yaw and roll from the detector's eye landmarks. Yaw is how
+    # far the eye midpoint sits from the box centre, relative to the eye
+    # distance (0 = frontal, ~0.5 = strong profile). None if no landmarks.
+    left_eye, right_eye = facial_area.get('left_eye'), facial_area.get('right_eye')
+    if left_eye is None or right_eye is None:
+        return None, None
+    (lx, ly), (rx, ry) = left_eye, right_eye
+    eye_distance = np.hypot(lx - rx, ly - ry)
+    if eye_distance == 0:
+        return None, None
+    centre_x = facial_area['x'] + facial_area['w'] / 2
+    yaw = abs((lx + rx) / 2 - centre_x) / eye_distance
+    roll = np.degrees(np.arctan2(ly - ry, lx - rx))
+    # Eyes are reported from the subject's point of view, so a level face
+    # gives roughly 0 degrees either way round
+    roll = abs((roll + 90) % 180 - 90)
+    return float(yaw), float(roll)
+
+
+def face_quality(frame, facial_area):
+    # Cheap quality measurements for one detected face in a BGR frame
+    crop = region(frame, facial_area)
+    size = min(int(facial_area['w']), int(facial_area['h']))
+    if crop.size == 0 or size <= 0:
+        return {'ok': False, 'reason': 'empty', 'score': 0.0, 'size': 0}
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    gray = cv2.resize(gray, (SCORE_SIZE, SCORE_SIZE), interpolation=cv2.INTER_AREA)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    brightness = float(gray.mean())
+    clipped = float(np.count_nonzero((gray <= 5) | (gray >= 250))) / gray.size
+    yaw, roll = pose(facial_area)
+
+    reason = None
+    if size < MIN_FACE_SIZE:
+        reason = 'small'
+    elif sharpness < MIN_SHARPNESS:
+        reason = 'blurred'
+    elif not MIN_BRIGHTNESS <= brightness <= MAX_BRIGHTNESS or clipped > MAX_CLIPPED:
+        reason = 'exposure'
+    elif yaw is not None and (yaw > MAX_YAW or roll > MAX_ROLL):
+        reason = 'pose'
+
+    # Single number for ranking usable faces, roughly 0-1 per factor
+    score = (min(sharpness / (4 * MIN_SHARPNESS), 1.0)
+             * min(size / (3 * MIN_FACE_SIZE), 1.0)
+             * (1.0 - abs(brightness - 128) / 128)
+             * (1.0 - min(yaw or 0.0, 1.0)))
+
+    return {
+        'ok': reason is None,
+        'reason': reason,
+        'score': float(score),
+        'size': size,
+        'sharpness': sharpness,
+        'brightness': brightness,
+        'clipped': clipped,
+        'yaw': yaw,
+        'roll': roll,
+    }
@@ -0,0 +1,165 @@
+import cv2
+import numpy as np
+from deepface.modules import preprocessing
+
+from models import get_detector, get_embedder
+from quality import face_quality
+
+
+def crop_aligned(frame, facial_area, margin=0.25):
+    # Full-resolution face crop, rotated so the eyes are level. Only a small
+    # window around the face is rotated, not the whole frame.
+    x, y, w, h = (facial_area[key] for key in ('x', 'y', 'w', 'h'))
+    height, width = frame.shape[:2]
+    x0, y0 = max(0, x - int(w * margin)), max(0, y - int(h * margin))
+    x1, y1 = min(width, x + w + int(w * margin)), min(height, y + h + int(h * margin))
+    window = frame[y0:y1, x0:x1]
+
+    left_eye, right_eye = facial_area.get('left_eye'), facial_area.get('right_eye')
+    if left_eye is not None and right_eye is not None and window.size:
+        # Same angle convention as DeepFace's align_img_wrt_eyes
+        angle = np.degrees(np.arctan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0]))
+        rotation = cv2.getRotationMatrix2D((x + w / 2 - x0, y + h / 2 - y0), angle, 1.0)
+        window = cv2.warpAffine(window, rotation, (window.shape[1], window.shape[0]))
+
+    face = window[y - y0:y - y0 + h, x - x0:x - x0 + w]
+    return face.astype(np.float32) / 255  # same scale as DeepFace.extract_faces
+
+
+class FrameRecognition:
+    """Decisions for every face in one frame, as parallel arrays."""
+
+    def __init__(self, boxes, labels, distances, recognized, embeddings,
+                 skipped=0, track_ids=None, embedded=None):
+        self.boxes = boxes  # (N, 4) int32 x, y, w, h
+        self.labels = labels  # (N,) best gallery label
+        self.distances = distances  # (N,) cosine distance to that label
+        self.recognized = recognized  # (N,) distance under the threshold
+        self.embeddings = embeddings  # (E, D) embeddings computed this frame
+        self.skipped = skipped  # faces detected but too poor to embed
+        # (N,) tracker id per face, 0 when not tracking
+        self.track_ids = np.zeros(len(boxes), dtype=np.int64) if track_ids is None else track_ids
+        # (E,) which faces were embedded this frame; the rest reused their
+        # track's identity
+        self.embedded = np.arange(len(boxes)) if embedded is None else embedded
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @classmethod
+    def empty(cls, dim=0, skipped=0):
+        return cls(np.zeros((0, 4), dtype=np.int32),
+                   np.zeros(0, dtype=object),
+                   np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=bool),
+                   np.zeros((0, dim), dtype=np.float32),
+                   skipped)
+
+
+class Recognizer:
+    """Detects every face in a frame once and embeds all of them in a single
+    batched forward pass before matching them against the gallery.
+
+    The detector and embedder come from models.py (see backends.py), so the
+    embedding can run on TensorFlow or ONNX Runtime."""
+
+    def __init__(self, gallery, threshold=0.4, model_name='VGG-Face',
+                 detector_backend='opencv', normalization='base', check_quality=True,
+                 tracker=None, roi=None, embed_backend=None):
+        self.gallery = gallery
+        self.roi = roi
+        self.threshold = threshold
+        self.check_quality = check_quality
+        self.tracker = tracker
+        self.detect_calls = 0
+        self.embed_calls = 0
+        self.detector_backend = detector_backend
+        self.normalization = normalization
+        # Built once per process and shared by every Recognizer
+        self.detector = get_detector(detector_backend)
+        self.embedder = get_embedder(model_name, embed_backend)
+
+    def detect(self, frame, roi=None):
+        # Aligned BGR crops plus their facial areas for each face in the
+        # frame. roi overrides the recognizer's own region for this call.
+        roi = self.roi if roi is None else roi
+        self.detect_calls += 1
+        if roi is not None:
+            return self.detect_in_roi(frame, roi)
+        return self.detector.detect(frame, align=True)
+
+    def detect_in_roi(self, frame, roi):
+        # Run the detector on a small copy of the doorway region only, then
+        # cut each face from the full-resolution frame for embedding
+        small, transform = roi.prepare(frame)
+        faces = self.detector.detect(small, align=False)  # aligned below, at full resolution
+        detected = []
+        for face in faces:
+            facial_area = roi.to_frame(face['facial_area'], transform)
+            if not roi.contains(facial_area):
+                continue
+            detected.append({
+                'face': crop_aligned(frame, facial_area),
+                'facial_area': facial_area,
+                'confidence': face['confidence'],
+            })
+        return detected
+
+    def preprocess(self, crop):
+        # Resize and normalize one crop exactly like DeepFace.represent does
+        width, height = self.embedder.input_shape
+        img = preprocessing.resize_image(img=crop, target_size=(height, width))
+        return preprocessing.normalize_input(img=img, normalization=self.normalization)
+
+    def embed(self, crops):
+        # Embed all crops in one forward pass, shape (N, D)
+        if len(crops) == 0:
+            return np.zeros((0, self.embedder.output_shape), dtype=np.float32)
+        batch = np.concatenate([self.preprocess(crop) for crop in crops])
+        self.embed_calls += 1
+        return np.asarray(self.embedder.embed(batch), dtype=np.float32)
+
+    def recognize(self, frame, now=None, tracker=None, roi=None):
+        # tracker and roi override the recognizer's own, so one model can
+        # serve several cameras that each keep their own tracks and region
+        tracker = self.tracker if tracker is None else tracker
+        faces = self.detect(frame, roi)
+        detected = len(faces)
+        qualities = [face_quality(frame, face['facial_area']) for face in faces]
+        if self.check_quality:
+            # Blurred, tiny, badly lit or profile faces would only produce
+            # unreliable matches, so don't spend an embedding on them
+            faces = [face for face, quality in zip(faces, qualities) if quality['ok']]
+            qualities = [quality for quality in qualities if quality['ok']]
+        if not faces:
+            if tracker is not None:
+                tracker.update([], now=now)  # let unseen tracks age out
+            return FrameRecognition.empty(self.embedder.output_shape, detected)
+
+        boxes = np.array([[face['facial_area'][key] for key in ('x', 'y', 'w', 'h')]
+                          for face in faces], dtype=np.int32)
+        if tracker is None:
+            embeddings = self.embed([face['face'] for face in faces])
+            labels, distances = self.gallery.match_many(embeddings)
+            return FrameRecognition(boxes, labels, distances,
+                                    distances < self.threshold, embeddings,
+                                    detected - len(faces))
+
+        # Only faces of new tracks, tracks due for re-verification or tracks
+        # whose face got noticeably better are embedded; everyone else keeps
+        # their track's last identity
+        track_ids, todo = tracker.update(
+            boxes, [quality['score'] for quality in qualities], now)
+        embeddings = self.embed([faces[index]['face'] for index in todo])
+        if len(todo):
+            labels, distances = self.gallery.match_many(embeddings)
+            for index, label, distance in zip(todo, labels, distances):
+                tracker.assign(track_ids[index], label, distance,
+                               distance < self.threshold, now)
+
+        tracks = [tracker.tracks[track_id] for track_id in track_ids]
+        labels = np.array([track.label for track in tracks], dtype=object)
+        distances = np.array([track.distance for track in tracks], dtype=np.float32)
+        return FrameRecognition(boxes, labels, distances,
+                                distances < self.threshold, embeddings,
+                                detected - len(faces), track_ids, todo)
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+
+class RegionOfInterest:
+    """Part of the camera frame guests actually walk through.
+
+    prepare() cuts the polygon's bounding box out of the frame, blanks
+    everything outside the polygon and shrinks the result so it is at most
+    detect_width pixels wide. The detector runs on that small copy, and
+    to_frame() maps its boxes and landmarks back to full-resolution frame
+    coordinates for cropping. With no polygon the whole frame is used."""
+
+    def __init__(self, polygon=None, detect_width=640):
+        self.polygon = None if polygon is None else np.asarray(polygon, dtype=np.int32).reshape(-1, 2)
+        self.detect_width = detect_width
+        self._mask = None
+        self._mask_shape = None
+
+    def bounds(self, frame_shape):
+        height, width = frame_shape[:2]
+        if self.polygon is None:
+            return 0, 0, width, height
+        x, y, w, h = cv2.boundingRect(self.polygon)
+        x, y = max(0, x), max(0, y)
+        return x, y, min(w, width - x), min(h, height - y)
+
+    def mask(self, frame_shape):
+        # Polygon mask over the bounding box, built once per frame size
+        if self._mask_shape != frame_shape[:2]:
+            x, y, w, h = self.bounds(frame_shape)
+            self._mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(self._mask, [self.polygon - (x, y)], 255)
+            self._mask_shape = frame_shape[:2]
+        return self._mask
+
+    def prepare(self, frame):
+        # Small detector input, plus the (scale, x offset, y offset) that
+        # to_frame() needs to undo it
+        x, y, w, h = self.bounds(frame.shape)
+        region = frame[y:y + h, x:x + w]
+        if self.polygon is not None:
+            region = cv2.bitwise_and(region, region, mask=self.mask(frame.shape))
+        scale = min(1.0, self.detect_width / w) if w else 1.0
+        if scale < 1.0:
+            region = cv2.resize(region, (round(w * scale), round(h * scale)),
+                                interpolation=cv2.INTER_AREA)
+        return region, (scale, x, y)
+
+    def to_frame(self, facial_area, transform):
+        # facial_area from the detector's small image, in frame pixels
+        scale, offset_x, offset_y = transform
+        mapped = {
+            'x': int(round(facial_area['x'] / scale)) + offset_x,
+            'y': int(round(facial_area['y'] / scale)) + offset_y,
+            'w': int(round(facial_area['w'] / scale)),
+            'h': int(round(facial_area['h'] / scale)),
+        }
+        for eye in ('left_eye', 'right_eye'):
+            point = facial_area.get(eye)
+            mapped[eye] = None if point is None else (
+                int(round(point[0] / scale)) + offset_x,
+                int(round(point[1] / scale)) + offset_y)
+        return mapped
+
+    def contains(self, facial_area):
+        # Whether the centre of a frame-coordinate box is inside the polygon
+        if self.polygon is None:
+            return True
+        centre = (facial_area['x'] + facial_area['w'] / 2,
+                  facial_area['y'] + facial_area['h'] / 2)
+        return cv2.pointPolygonTest(self.polygon, centre, False) >= 0
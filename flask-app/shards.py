@@ -0,0 +1,176 @@
+import collections
+import os
+import re
+import threading
+import time
+
+from gallery import GalleryIndex, LiveGallery, embed_image, file_key, label_from_path
+
+SHARD_NAME = 'event_{event_id}_{embedder}.npz'
+
+
+class GalleryShards:
+    """Guest embeddings stored per event, so a running event only matches
+    against its own guest list.
+
+    Each event's shard is a GalleryIndex file under directory, loaded as a
+    LiveGallery so guests enrolled during the event join it without a
+    reload. Loaded shards are kept in least-recently-used order and dropped once they no longer fit
+    in max_bytes. A shard can be given an expiry time (the event's end), after
+    which expire() drops it from memory; the file stays on disk."""
+
+    def __init__(self, directory='shards', model_name='VGG-Face',
+                 max_bytes=256 * 2**20, clock=time.time, embed_backend=None):
+        self.directory = directory
+        self.model_name = model_name
+        self.embed_backend = embed_backend
+        self._recognizer = None
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._loaded = collections.OrderedDict()  # event id -> LiveGallery
+        self._expires = {}  # event id -> clock() time
+        self._lock = threading.Lock()
+
+    @property
+    def recognizer(self):
+        # Detector and embedder for building shards, created on first use so
+        # constructing GalleryShards loads no model
+        if self._recognizer is None:
+            from recognition import Recognizer
+
+            self._recognizer = Recognizer(None, model_name=self.model_name,
+                                          embed_backend=self.embed_backend)
+        return self._recognizer
+
+    @property
+    def embedder_name(self):
+        return self.recognizer.embedder.name
+
+    def __contains__(self, event_id):
+        return str(event_id) in self._loaded
+
+    def path(self, event_id):
+        safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', str(event_id))
+        return os.path.join(self.directory, SHARD_NAME.format(
+            event_id=safe_id, embedder=file_key(self.embedder_name)))
+
+    def get(self, event_id):
+        # Loaded shard for the event, or None
+        event_id = str(event_id)
+        with self._lock:
+            shard = self._loaded.get(event_id)
+            if shard is not None:
+                self._loaded.move_to_end(event_id)
+            return shard
+
+    def load(self, event_id, expires_at=None, images=()):
+        # Bring the event's shard into memory. Guests in images (frames saved
+        # before the shard file existed, e.g. enrolled before shards were
+        # introduced) that the shard doesn't have yet are embedded and added,
+        # and the shard is written out.
+        event_id = str(event_id)
+        with self._lock:
+            shard = self._loaded.get(event_id)
+            if shard is None:
+                index = self._read(event_id)
+                if index is None:
+                    index = GalleryIndex([], [], model_name=self.embedder_name)
+                known = set(index.labels)
+                missing = [img_path for img_path in images
+                           if label_from_path(img_path) not in known]
+                if missing or not os.path.exists(self.path(event_id)):
+                    built = self._build(missing)
+                    index = index.extend(built.matrix, built.labels)
+                    self._save(event_id, index)
+                shard = LiveGallery(index)
+            self._loaded[event_id] = shard
+            self._loaded.move_to_end(event_id)
+            if expires_at is not None:
+                self._expires[event_id] = expires_at
+            self._fit_budget(keep=event_id)
+        print(f"Loaded {len(shard)} gallery embeddings for event {event_id}")
+        return shard
+
+    def append(self, event_id, label, embeddings):
+        # Add a newly enrolled guest to the event's shard file. If the shard
+        # is loaded the guest goes live straight away: only their rows are
+        # added and matching carries on against the previous index until the
+        # new one is swapped in. Returns the updated GalleryIndex.
+        event_id = str(event_id)
+        labels = [label] * len(embeddings)
+        with self._lock:
+            live = self._loaded.get(event_id)
+            if live is not None:
+                index = live.extend(embeddings, labels)
+            else:
+                index = self._read(event_id)
+                if index is None:
+                    index = GalleryIndex([], [], model_name=self.embedder_name)
+                index = index.extend(embeddings, labels)
+            self._save(event_id, index)
+            if live is not None:
+                self._fit_budget(keep=event_id)
+        return index
+
+    def evict(self, event_id):
+        event_id = str(event_id)
+        with self._lock:
+            self._expires.pop(event_id, None)
+            return self._loaded.pop(event_id, None) is not None
+
+    def expire(self, now=None):
+        # Drop every shard whose event has ended. Returns their event ids.
+        now = self.clock() if now is None else now
+        with self._lock:
+            ended = [event_id for event_id, expires_at in self._expires.items()
+                     if expires_at <= now]
+            for event_id in ended:
+                del self._expires[event_id]
+                self._loaded.pop(event_id, None)
+        return ended
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': list(self._loaded),
+                    'bytes': sum(shard.nbytes for shard in self._loaded.values()),
+                    'max_bytes': self.max_bytes}
+
+    def _read(self, event_id):
+        path = self.path(event_id)
+        if not os.path.exists(path):
+            return None
+        return GalleryIndex.load(path)
+
+    def _save(self, event_id, index):
+        # The directory is only created once there is a shard to write, so
+        # constructing GalleryShards (e.g. when app.py is imported) has no
+        # side effects on disk
+        os.makedirs(self.directory, exist_ok=True)
+        index.save(self.path(event_id))
+
+    def _build(self, images):
+        embeddings, labels = [], []
+        for img_path in images:
+            try:
+                embedding = embed_image(img_path, self.recognizer)
+            except Exception as e:
+                print(f"Error embedding gallery image {img_path}: {e}")
+                continue
+            if embedding is None:
+                print(f"No face found in gallery image {img_path}")
+                continue
+            embeddings.append(embedding)
+            labels.append(label_from_path(img_path))
+        return GalleryIndex(embeddings, labels, model_name=self.embedder_name)
+
+    def _fit_budget(self, keep):
+        # Least recently used shards go first; the one just used always stays
+        total = sum(shard.nbytes for shard in self._loaded.values())
+        for event_id in list(self._loaded):
+            if total <= self.max_bytes:
+                break
+            if event_id == keep:
+                continue
+            total -= self._loaded.pop(event_id).nbytes
+            self._expires.pop(event_id, None)
+            print(f"Evicted gallery shard for event {event_id} to stay within budget")
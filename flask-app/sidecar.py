@@ -0,0 +1,42 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def serve(routes, host='0.0.0.0', port=8080, name='sidecar'):
+    # Small HTTP server for the endpoints the Flask app would otherwise serve,
+    # for when recognition runs on its own (python face_detection.py). routes
+    # maps a path to a function returning (content type, body); a body that
+    # isn't bytes is an iterable of chunks, streamed until it ends or the
+    # client goes away. Returns the server; it runs on a daemon thread.
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            route = routes.get(self.path)
+            if route is None:
+                self.send_error(404)
+                return
+            content_type, body = route()
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            if isinstance(body, bytes):
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.end_headers()
+            try:
+                for chunk in body:
+                    self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client went away
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'{name}-http', daemon=True).start()
+    return server
@@ -0,0 +1,144 @@
+import queue
+import sqlite3
+import threading
+
+# Applied to every new connection. WAL lets the API read while the
+# recognition side is writing sightings, and NORMAL sync is durable enough
+# under WAL while costing far fewer fsyncs.
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',  # 16 MB page cache
+    'PRAGMA mmap_size = 134217728',  # 128 MB
+)
+
+# Python's sqlite3 keeps compiled statements per connection, so reusing a
+# connection means each query in app.py is only prepared once per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Idle connections kept per database file. Flask's dev server runs every
+# request on a new thread, so connections are pooled rather than kept per
+# thread; a burst past this many opens extra ones that are closed afterwards.
+POOL_SIZE = 8
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Never edit an entry once it has shipped; append a new one instead.
+MIGRATIONS = [
+    # 1: original tables
+    [
+        '''CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hostEmail TEXT NOT NULL,
+            eventId TEXT NOT NULL,
+            name TEXT NOT NULL,
+            date DATE NOT NULL,
+            location TEXT NOT NULL,
+            startTime TIME NOT NULL,
+            endTime TIME NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS guests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            eventId TEXT NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            videoName TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS entry_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            eventId TEXT NOT NULL,
+            guestId TEXT NOT NULL,
+            entryTime TIMESTAMP,
+            exitTime TIMESTAMP
+        )''',
+    ],
+    # 2: indexes for every lookup in app.py
+    [
+        # GET /event/<eventId> is answered from the index alone, and
+        # /start-event's UPDATE finds its row through it
+        '''CREATE INDEX IF NOT EXISTS idx_events_eventId
+            ON events (eventId, name, location, date, startTime, endTime)''',
+        # GET /events?email=
+        'CREATE INDEX IF NOT EXISTS idx_events_hostEmail ON events (hostEmail)',
+        # GET /event/<eventId>/guests
+        'CREATE INDEX IF NOT EXISTS idx_guests_eventId ON guests (eventId)',
+        # GET /entries, newest first
+        'CREATE INDEX IF NOT EXISTS idx_entry_log_entryTime ON entry_log (entryTime)',
+        # Entries for one event in time order
+        '''CREATE INDEX IF NOT EXISTS idx_entry_log_eventId_entryTime
+            ON entry_log (eventId, entryTime)''',
+    ],
+]
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(database):
+    # New connection with the performance pragmas applied. It may be used by
+    # another thread later, but only by one at a time (see get_connection).
+    db = sqlite3.connect(database, cached_statements=STATEMENT_CACHE_SIZE,
+                         check_same_thread=False)
+    for pragma in PRAGMAS:
+        db.execute(pragma)
+    return db
+
+
+def _pool(database):
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return pool
+
+
+def get_connection(database):
+    # Take an idle connection, or open one if there is none. Give it back
+    # with release_connection() when done.
+    try:
+        return _pool(database).get_nowait()
+    except queue.Empty:
+        return connect(database)
+
+
+def release_connection(database, db):
+    # Called at the end of a request: drop any transaction the request left
+    # open and keep the connection for the next one, unless enough are idle
+    if db.in_transaction:
+        db.rollback()
+    try:
+        _pool(database).put_nowait(db)
+    except queue.Full:
+        db.close()
+
+
+def close_connections(database):
+    # Close every idle connection, e.g. before replacing the database file
+    pool = _pool(database)
+    while True:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+
+def migrate(db):
+    # Bring the schema up to date; safe to run on every start
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        with db:
+            db.execute('BEGIN')
+            for statement in statements:
+                db.execute(statement)
+            db.execute(f'PRAGMA user_version = {number}')
+        print(f"Applied database migration {number}")
+    return len(MIGRATIONS)
+
+
+def init_db(database):
+    db = get_connection(database)
+    try:
+        migrate(db)
+    finally:
+        release_connection(database, db)
@@ -0,0 +1,78 @@
+import unittest
+
+from decision import DecisionEngine
+
+
+def replay(fps, seconds, sightings):
+    # Feed a recorded stream to a fresh engine. sightings(t) gives the
+    # (track id, recognized, label) triples seen at t seconds. Returns each
+    # track's decision changes as (t, decision).
+    engine = DecisionEngine()
+    changes = {}
+    for frame in range(int(seconds * fps)):
+        t = frame / fps
+        seen = sightings(t)
+        decisions, changed = engine.update([track_id for track_id, _, _ in seen],
+                                           [recognized for _, recognized, _ in seen],
+                                           [label for _, _, label in seen], t)
+        for (track_id, _, _), decision, new in zip(seen, decisions, changed):
+            if new:
+                changes.setdefault(track_id, []).append((t, decision))
+    return changes
+
+
+def doorway(t):
+    # 1 is a guest the whole time, 2 never matches, 3 matches for 1.5 s and
+    # then stops matching (e.g. turned away, or a look-alike)
+    return [(1, True, 'alice'), (2, False, 'bob'), (3, t < 1.5, 'carol')]
+
+
+class DecisionEngineTest(unittest.TestCase):
+
+    def assertChanges(self, actual, expected, fps):
+        # Same decisions, each within one frame of the expected time
+        self.assertEqual([decision for _, decision in actual],
+                         [decision for _, decision in expected])
+        for (t, _), (expected_t, _) in zip(actual, expected):
+            self.assertLessEqual(abs(t - expected_t), 1 / fps + 1e-9)
+
+    def test_same_decisions_at_5_and_30_fps(self):
+        for fps in (5, 30):
+            changes = replay(fps, 4, doorway)
+            self.assertChanges(changes[1], [(0.57, 'guest')], fps)
+            self.assertChanges(changes[2], [(0.57, 'intruder')], fps)
+
+    def test_hysteresis(self):
+        # Carol stays a guest for a while after she stops matching, and only
+        # becomes an intruder once the non-matching evidence dominates
+        for fps in (5, 30):
+            changes = replay(fps, 4, doorway)
+            self.assertChanges(changes[3], [(0.57, 'guest'), (2.2, 'undecided'),
+                                            (3.13, 'intruder')], fps)
+
+    def test_flicker_does_not_flip_a_decision(self):
+        # Every fifth frame fails to match: the guest decision holds
+        changes = replay(30, 4, lambda t: [(1, round(t * 30) % 5 != 4, 'alice')])
+        self.assertEqual([decision for _, decision in changes[1]], ['guest'])
+
+    def test_replay_is_deterministic(self):
+        self.assertEqual(replay(30, 4, doorway), replay(30, 4, doorway))
+
+    def test_untracked_faces_do_not_share_a_row(self):
+        engine = DecisionEngine(capacity=2)
+        engine.update([0, 5], [True, False], ['alice', 'bob'], 0.0)
+        engine.update([0, 5, 6], [True, False, True], ['alice', 'bob', 'carol'], 0.1)
+        self.assertEqual(len({engine._rows[track_id] for track_id in (0, 5, 6)}), 3)
+        self.assertEqual(engine.label(0), 'alice')
+        self.assertIsNone(engine.label(5))
+
+    def test_tracks_expire(self):
+        engine = DecisionEngine(max_age=2.0)
+        engine.update([1], [True], ['alice'], 0.0)
+        engine.update([2], [True], ['bob'], 3.0)
+        self.assertEqual(len(engine), 1)
+        self.assertEqual(engine.decision(1), 'undecided')
+
+
+if __name__ == '__main__':
+    unittest.main()
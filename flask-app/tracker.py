@@ -0,0 +1,130 @@
+import itertools
+import time
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    # Pairwise intersection-over-union of (N, 4) and (M, 4) x, y, w, h boxes
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    inter_w = np.clip(np.minimum(ax2[:, None], bx2) - np.maximum(a[:, None, 0], b[:, 0]), 0, None)
+    inter_h = np.clip(np.minimum(ay2[:, None], by2) - np.maximum(a[:, None, 1], b[:, 1]), 0, None)
+    inter = inter_w * inter_h
+    union = (a[:, 2] * a[:, 3])[:, None] + b[:, 2] * b[:, 3] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    """One person followed across frames, with the identity from their last
+    embedding."""
+
+    def __init__(self, track_id, box, quality, now):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(2, dtype=np.float32)  # box corner, px/s
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.quality = quality  # quality of the current frame's face
+        # Filled in by assign() after the track's face has been embedded
+        self.embedded_at = None
+        self.embedded_quality = None
+        self.label = None
+        self.distance = np.inf
+        self.recognized = False
+
+    def predict(self, now):
+        # Where the box should be now, assuming constant velocity
+        box = self.box.copy()
+        box[:2] += self.velocity * (now - self.last_seen)
+        return box
+
+    def update(self, box, quality, now, smoothing=0.5):
+        box = np.asarray(box, dtype=np.float32)
+        dt = now - self.last_seen
+        if dt > 0:
+            velocity = (box[:2] - self.box[:2]) / dt
+            self.velocity = smoothing * velocity + (1 - smoothing) * self.velocity
+        self.box = box
+        self.last_seen = now
+        self.hits += 1
+        self.quality = quality
+
+
+class FaceTracker:
+    """Keeps stable ids for faces across frames by matching detector boxes to
+    motion-predicted tracks on IoU. A track's face is only re-embedded when
+    the track is new, its face quality has clearly improved since the last
+    embedding, or reverify_interval seconds have passed."""
+
+    def __init__(self, min_iou=0.3, max_age=1.0, reverify_interval=5.0,
+                 quality_gain=0.25, clock=time.monotonic):
+        self.min_iou = min_iou
+        self.max_age = max_age
+        self.reverify_interval = reverify_interval
+        self.quality_gain = quality_gain
+        self.clock = clock
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def update(self, boxes, qualities=None, now=None):
+        # Match this frame's boxes to tracks. Returns the track id for each
+        # box and the indices of the boxes whose faces need an embedding.
+        now = self.clock() if now is None else now
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if qualities is None:
+            qualities = np.ones(len(boxes), dtype=np.float32)
+
+        # Drop tracks nobody has seen for max_age seconds
+        self.tracks = {track_id: track for track_id, track in self.tracks.items()
+                       if now - track.last_seen <= self.max_age}
+
+        tracks = list(self.tracks.values())
+        track_ids = np.zeros(len(boxes), dtype=np.int64)
+        if tracks and len(boxes):
+            predicted = np.array([track.predict(now) for track in tracks])
+            overlaps = iou_matrix(boxes, predicted)
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(overlaps, axis=None)[::-1]:
+                box_index, track_index = np.unravel_index(flat, overlaps.shape)
+                if overlaps[box_index, track_index] < self.min_iou:
+                    break
+                if track_ids[box_index] or tracks[track_index] is None:
+                    continue
+                track = tracks[track_index]
+                track.update(boxes[box_index], float(qualities[box_index]), now)
+                track_ids[box_index] = track.id
+                tracks[track_index] = None
+
+        for box_index in np.flatnonzero(track_ids == 0):
+            track = Track(next(self._ids), boxes[box_index], float(qualities[box_index]), now)
+            self.tracks[track.id] = track
+            track_ids[box_index] = track.id
+
+        needs_embedding = [index for index, track_id in enumerate(track_ids)
+                           if self.needs_embedding(self.tracks[track_id], now)]
+        return track_ids, np.asarray(needs_embedding, dtype=np.int64)
+
+    def needs_embedding(self, track, now):
+        if track.embedded_at is None:
+            return True
+        if now - track.embedded_at >= self.reverify_interval:
+            return True
+        return track.quality > track.embedded_quality * (1 + self.quality_gain)
+
+    def assign(self, track_id, label, distance, recognized, now=None):
+        # Record the identity from a fresh embedding of this track's face
+        track = self.tracks.get(track_id)
+        if track is None:
+            return
+        track.embedded_at = self.clock() if now is None else now
+        track.embedded_quality = track.quality
+        track.label = label
+        track.distance = float(distance)
+        track.recognized = bool(recognized)
@@ -1,15 +1,24 @@
+import os
 import random
-import nltk
-from nltk.corpus import words
 
-# Download the word list if you haven't already
-nltk.download('words')
+# Bundled word list, one lowercase word per line. Read once, the first time
+# an ID is generated, so nothing is downloaded or loaded at import time.
+WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'words.txt')
+
+word_list = None
+
+
+def load_words(path=WORDS_PATH):
+    # Kept as a tuple so random.sample indexes straight into it
+    with open(path, encoding='utf-8') as f:
+        return tuple(line.strip() for line in f if line.strip())
 
-# Fetch the list of words
-word_list = words.words()
 
 # Function to generate the unique ID
 def generate_unique_id(num_words=4):
+    global word_list
+    if word_list is None:
+        word_list = load_words()
     # Randomly select words and join them with dashes
     selected_words = random.sample(word_list, num_words)
     return '-'.join(selected_words)